@@ -1,7 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import asyncio
 import os
+import time
+
+from metrics import password_hashing
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -9,12 +14,64 @@ SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-change-in-product
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_pending = 0
+_hash_stats = {"completed": 0, "rejected": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+class PasswordHasherBusy(Exception):
+    pass
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_hasher(operation: str, fn, *args):
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_QUEUE_LIMIT:
+        _hash_stats["rejected"] += 1
+        raise PasswordHasherBusy()
+
+    queued_at = time.perf_counter()
+
+    def job():
+        return time.perf_counter() - queued_at, fn(*args)
+
+    _hash_pending += 1
+    try:
+        wait, result = await asyncio.get_running_loop().run_in_executor(_hash_executor, job)
+    finally:
+        _hash_pending -= 1
+    _hash_stats["completed"] += 1
+    password_hashing.observe(time.perf_counter() - queued_at, operation)
+    _hash_stats["wait_total"] += wait
+    _hash_stats["wait_max"] = max(_hash_stats["wait_max"], wait)
+    return result
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hasher("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hasher("hash", get_password_hash, password)
+
+def password_hasher_stats() -> dict:
+    completed = _hash_stats["completed"]
+    return {
+        **_hash_stats,
+        "pending": _hash_pending,
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        "wait_avg": _hash_stats["wait_total"] / completed if completed else 0.0,
+    }
+
+def shutdown_password_hasher():
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
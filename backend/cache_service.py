@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from bson import Binary
+
+from compression import compress
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_ENTRIES = int(os.environ.get("TMDB_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.environ.get("TMDB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+def etag_for(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+class CacheEntry:
+    __slots__ = ("data", "body", "size", "expires_at", "stale_until", "_etag", "variants", "variant_bytes", "_owner")
+
+    def __init__(self, data: Any, body: bytes, expires_at: float, stale_until: Optional[float] = None):
+        self.data = data
+        self.body = body
+        self.size = len(body)
+        self.expires_at = expires_at
+        # Past expires_at the entry may still be served while it is revalidated
+        self.stale_until = max(stale_until or expires_at, expires_at)
+        self._etag = None
+        # compressed copies of body, built on first request for each encoding
+        self.variants: Dict[str, bytes] = {}
+        self.variant_bytes = 0
+        # the LRUCache holding this entry, told when variants add to its footprint
+        self._owner: Optional["LRUCache"] = None
+
+    @property
+    def etag(self) -> str:
+        if self._etag is None:
+            self._etag = etag_for(self.body)
+        return self._etag
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        variant = self.variants.get(encoding)
+        if variant is None:
+            variant = self.variants[encoding] = compress(self.body, encoding)
+            self.variant_bytes += len(variant)
+            if self._owner is not None:
+                self._owner.grew(len(variant))
+        return variant
+
+    @property
+    def footprint(self) -> int:
+        return self.size + self.variant_bytes
+
+    @property
+    def ttl(self) -> float:
+        return self.expires_at - time.time()
+
+    def is_fresh(self) -> bool:
+        return self.ttl > 0
+
+    def is_usable(self) -> bool:
+        return self.stale_until > time.time()
+
+class LRUCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not entry.is_usable():
+            self.delete(key)
+            return None
+        if not allow_stale and not entry.is_fresh():
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        if entry.footprint > self.max_bytes:
+            return
+        self.delete(key)
+        self._entries[key] = entry
+        entry._owner = self
+        self.size += entry.footprint
+        self._evict()
+
+    def grew(self, amount: int):
+        # a cached entry built a compressed variant
+        self.size += amount
+        self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._detach(evicted)
+            self.evictions += 1
+
+    def _detach(self, entry: CacheEntry):
+        entry._owner = None
+        self.size -= entry.footprint
+
+    def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._detach(entry)
+
+    def delete_where(self, predicate: Callable[[CacheEntry], bool]):
+        for key in [key for key, entry in self._entries.items() if predicate(entry)]:
+            self.delete(key)
+
+    def clear(self):
+        for entry in self._entries.values():
+            entry._owner = None
+        self._entries.clear()
+        self.size = 0
+
+class MongoCache:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def setup(self):
+        await self.collection.create_index("stale_until", expireAfterSeconds=0)
+
+    async def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        doc = await self.collection.find_one({"_id": key})
+        if doc is None:
+            return None
+        expires_at = doc["expires_at"].replace(tzinfo=timezone.utc).timestamp()
+        stale_until = doc.get("stale_until", doc["expires_at"]).replace(tzinfo=timezone.utc).timestamp()
+        now = time.time()
+        if stale_until <= now or (not allow_stale and expires_at <= now):
+            return None
+        body = bytes(doc["body"])
+        return CacheEntry(json.loads(body), body, expires_at, stale_until)
+
+    async def set(self, key: str, entry: CacheEntry):
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "body": Binary(entry.body),
+                "expires_at": datetime.fromtimestamp(entry.expires_at, timezone.utc),
+                "stale_until": datetime.fromtimestamp(entry.stale_until, timezone.utc),
+            }},
+            upsert=True,
+        )
+
+class TTLCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key: Any) -> Optional[Any]:
+        item = self._entries.get(key)
+        if item is None or item[1] <= time.monotonic():
+            if item is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key: Any, value: Any):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Any):
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+class ResponseCache:
+    def __init__(self, local: Optional[LRUCache] = None, shared: Optional[MongoCache] = None):
+        self.local = local or LRUCache()
+        self.shared = shared
+        self._stats = {"hits": 0, "stale_hits": 0, "shared_hits": 0, "misses": 0, "sets": 0, "shared_errors": 0}
+
+    async def attach_shared(self, collection):
+        shared = MongoCache(collection)
+        try:
+            await shared.setup()
+        except Exception:
+            logger.exception("Failed to set up shared TMDb cache")
+            return
+        self.shared = shared
+
+    async def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        entry = self.local.get(key, allow_stale)
+        if entry is not None:
+            self._stats["hits" if entry.is_fresh() else "stale_hits"] += 1
+            return entry
+        if self.shared is not None:
+            try:
+                entry = await self.shared.get(key, allow_stale)
+            except Exception:
+                self._stats["shared_errors"] += 1
+                logger.exception("Shared TMDb cache read failed")
+                entry = None
+            if entry is not None:
+                self._stats["shared_hits"] += 1
+                self.local.set(key, entry)
+                return entry
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, data: Any, body: bytes, ttl: float, stale_ttl: float = 0) -> CacheEntry:
+        now = time.time()
+        return await self.put(key, CacheEntry(data, body, now + ttl, now + ttl + stale_ttl))
+
+    async def put(self, key: str, entry: CacheEntry) -> CacheEntry:
+        self.local.set(key, entry)
+        self._stats["sets"] += 1
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, entry)
+            except Exception:
+                self._stats["shared_errors"] += 1
+                logger.exception("Shared TMDb cache write failed")
+        return entry
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "entries": len(self.local),
+            "bytes": self.local.size,
+            "max_bytes": self.local.max_bytes,
+            "evictions": self.local.evictions,
+            "shared": self.shared is not None,
+        }
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        # Shield so one cancelled caller doesn't cancel the shared request for the others
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter went away
+            task.exception()
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
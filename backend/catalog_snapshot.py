@@ -0,0 +1,215 @@
+"""Offline catalog snapshot: popular/trending pages and title details in one
+memory-mapped file, so fresh workers start with a warm catalog.
+
+Build one before a deploy with:
+
+    python catalog_snapshot.py build --pages 5 --output catalog.snap
+
+Layout (little-endian): a fixed header, the raw TMDb response bodies back to
+back, then an index of (offset, length, key) records pointed to by the header.
+"""
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from cache_service import CacheEntry
+
+CATALOG_SNAPSHOT_PATH = os.environ.get("CATALOG_SNAPSHOT_PATH", str(Path(__file__).parent / "catalog.snap"))
+
+MAGIC = b"NBCS"
+VERSION = 1
+# magic, version, entry count, created_at, index offset
+HEADER = struct.Struct("<4sHIdQ")
+# body offset, body length, key length; followed by the utf-8 key
+RECORD = struct.Struct("<QIH")
+
+class SnapshotError(Exception):
+    pass
+
+class CatalogSnapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                # read-only shared mapping: every worker process reuses the same page cache
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                # an empty file cannot be mapped
+                raise SnapshotError(f"{path} is empty") from e
+        try:
+            magic, version, count, created_at, index_offset = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise SnapshotError(f"{path} is not a catalog snapshot")
+            if version != VERSION:
+                raise SnapshotError(f"{path} has snapshot version {version}, expected {VERSION}")
+            self.created_at = created_at
+            self._index: Dict[str, Tuple[int, int]] = {}
+            position = index_offset
+            for _ in range(count):
+                offset, length, key_length = RECORD.unpack_from(self._map, position)
+                position += RECORD.size
+                # slicing past the end would quietly return a short key or body
+                if position + key_length > len(self._map) or offset + length > index_offset:
+                    raise SnapshotError(f"{path} is truncated or corrupt")
+                key = self._map[position:position + key_length].decode("utf-8")
+                position += key_length
+                self._index[key] = (offset, length)
+        except (struct.error, UnicodeDecodeError) as e:
+            self._map.close()
+            raise SnapshotError(f"{path} is truncated: {e}") from e
+        except SnapshotError:
+            self._map.close()
+            raise
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def get(self, key: str) -> Optional[bytes]:
+        location = self._index.get(key)
+        if location is None:
+            return None
+        offset, length = location
+        return self._map[offset:offset + length]
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._index)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def close(self):
+        self._map.close()
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "entries": len(self._index),
+            "bytes": len(self._map),
+            "age": round(self.age),
+            "hits": self.hits,
+        }
+
+class SnapshotEntry(CacheEntry):
+    # A cache entry read straight from the shared mapping: the body is copied out per response and
+    # parsed per use, so a worker keeps nothing per snapshot entry beyond its compressed variants
+    __slots__ = ("_snapshot", "_key")
+
+    def __init__(self, snapshot: CatalogSnapshot, key: str, expires_at: float, stale_until: Optional[float] = None):
+        self._snapshot = snapshot
+        self._key = key
+        self.size = snapshot._index[key][1]
+        self.expires_at = expires_at
+        self.stale_until = max(stale_until or expires_at, expires_at)
+        self._etag = None
+        self.variants = {}
+        self.variant_bytes = 0
+        self._owner = None
+
+    @property
+    def body(self) -> bytes:
+        return self._snapshot.get(self._key)
+
+    @property
+    def data(self) -> Any:
+        return json.loads(self.body)
+
+    @property
+    def footprint(self) -> int:
+        # the body lives in page cache shared by every worker
+        return self.variant_bytes
+
+def write_snapshot(path: str, entries: Dict[str, bytes], created_at: Optional[float] = None) -> int:
+    created_at = time.time() if created_at is None else created_at
+    records = []
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        offset = HEADER.size
+        for key, body in entries.items():
+            f.write(body)
+            records.append((offset, len(body), key.encode("utf-8")))
+            offset += len(body)
+        index_offset = offset
+        for body_offset, length, key in records:
+            f.write(RECORD.pack(body_offset, length, len(key)))
+            f.write(key)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), created_at, index_offset))
+    # readers that already mapped the old file keep their pages; new workers see the new one
+    os.replace(tmp, path)
+    return len(records)
+
+async def collect(pages: int, details: bool = True) -> Dict[str, bytes]:
+    from tmdb_service import DETAILS_APPEND, WARM_ENDPOINTS, tmdb_service
+
+    entries: Dict[str, bytes] = {}
+    titles = []
+    await tmdb_service.start()
+    try:
+        for endpoint in WARM_ENDPOINTS:
+            section = endpoint.split("/", 1)[0]
+            for page in range(1, pages + 1):
+                params = {"page": page}
+                entry = await tmdb_service._get_entry(endpoint, params, None)
+                if entry is None:
+                    print(f"Skipping {endpoint} page {page}: upstream request failed")
+                    continue
+                entries[tmdb_service.cache_key(endpoint, params)] = entry.body
+                for item in entry.data.get("results") or []:
+                    media_type = item.get("media_type") or section
+                    if media_type in ("movie", "tv") and item.get("id") is not None:
+                        titles.append((media_type, item["id"]))
+
+        if details:
+            semaphore = asyncio.Semaphore(8)
+
+            async def fetch(media_type: str, tmdb_id: int):
+                endpoint = f"{media_type}/{tmdb_id}"
+                params = {"append_to_response": DETAILS_APPEND}
+                async with semaphore:
+                    entry = await tmdb_service._get_entry(endpoint, params, None)
+                if entry is not None:
+                    entries[tmdb_service.cache_key(endpoint, params)] = entry.body
+
+            await asyncio.gather(*(fetch(media_type, tmdb_id) for media_type, tmdb_id in dict.fromkeys(titles)))
+    finally:
+        await tmdb_service.close()
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the offline TMDb catalog snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="fetch popular/trending pages and details into a snapshot")
+    build.add_argument("--output", default=CATALOG_SNAPSHOT_PATH)
+    build.add_argument("--pages", type=int, default=5)
+    build.add_argument("--no-details", action="store_true", help="only store the list pages")
+    info = commands.add_parser("info", help="print a snapshot's header and keys")
+    info.add_argument("path", nargs="?", default=CATALOG_SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        entries = asyncio.run(collect(args.pages, details=not args.no_details))
+        count = write_snapshot(args.output, entries)
+        print(f"Wrote {count} entries ({os.path.getsize(args.output)} bytes) to {args.output}")
+    else:
+        snapshot = CatalogSnapshot(args.path)
+        print(snapshot.stats())
+        for key in snapshot.keys():
+            print(key)
+        snapshot.close()
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / ".env")
+    main()
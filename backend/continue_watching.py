@@ -0,0 +1,174 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from cache_service import SingleFlight, etag_for
+from responses import dumps
+from tmdb_service import tmdb_service
+
+logger = logging.getLogger(__name__)
+
+CONTINUE_WATCHING_LIMIT = int(os.environ.get("CONTINUE_WATCHING_LIMIT", "20"))
+# Titles watched less than / at least this fraction of their runtime are not worth resuming
+CONTINUE_WATCHING_MIN_PROGRESS = float(os.environ.get("CONTINUE_WATCHING_MIN_PROGRESS", "0.02"))
+CONTINUE_WATCHING_MAX_PROGRESS = float(os.environ.get("CONTINUE_WATCHING_MAX_PROGRESS", "0.95"))
+# Most recent history rows read when a rail is built
+CONTINUE_WATCHING_SCAN_LIMIT = int(os.environ.get("CONTINUE_WATCHING_SCAN_LIMIT", "200"))
+CONTINUE_WATCHING_MAX_PROFILES = int(os.environ.get("CONTINUE_WATCHING_MAX_PROFILES", "10000"))
+# Each worker keeps its own rails; this bounds how long writes made through another worker stay invisible
+CONTINUE_WATCHING_TTL = float(os.environ.get("CONTINUE_WATCHING_TTL", "30"))
+
+HISTORY_PROJECTION = {"_id": 0, "tmdb_id": 1, "media_type": 1, "position": 1, "duration": 1, "last_watched": 1}
+
+def progress(entry: Dict) -> Optional[float]:
+    duration = entry.get("duration") or 0
+    if duration <= 0:
+        return None
+    return entry.get("position", 0) / duration
+
+def in_progress(entry: Dict) -> bool:
+    fraction = progress(entry)
+    return fraction is not None and CONTINUE_WATCHING_MIN_PROGRESS <= fraction < CONTINUE_WATCHING_MAX_PROGRESS
+
+class Rail:
+    __slots__ = ("items", "cards", "complete", "built_at", "version", "rendered")
+
+    def __init__(self, items: List[Dict], complete: bool):
+        # tmdb_id -> history fields, least recently watched first
+        self.items: "OrderedDict[int, Dict]" = OrderedDict((item["tmdb_id"], item) for item in reversed(items))
+        # tmdb_id -> card, only for titles whose details loaded
+        self.cards: Dict[int, Dict] = {}
+        # False when in-progress titles beyond the ones held here may exist
+        self.complete = complete
+        self.built_at = time.monotonic()
+        # bumped on every change, so a render that awaited across a write can tell it is stale
+        self.version = 0
+        self.rendered: Optional[Tuple[bytes, str]] = None
+
+class ContinueWatching:
+    def __init__(self, collection, progress_buffer, limit: int = CONTINUE_WATCHING_LIMIT,
+                 max_profiles: int = CONTINUE_WATCHING_MAX_PROFILES, ttl: float = CONTINUE_WATCHING_TTL):
+        self.collection = collection
+        self.progress_buffer = progress_buffer
+        self.limit = limit
+        # a few spare titles so finishing one doesn't force a rebuild
+        self.capacity = limit * 2
+        self.max_profiles = max_profiles
+        self.ttl = ttl
+        self._rails: "OrderedDict[str, Rail]" = OrderedDict()
+        self._loading = SingleFlight()
+        self._stats = {"served": 0, "built": 0, "rendered": 0, "partial": 0, "incremental_updates": 0, "invalidations": 0}
+
+    def record(self, profile_id: str, entry: Dict):
+        rail = self._rails.get(profile_id)
+        if rail is None:
+            return
+        self._stats["incremental_updates"] += 1
+        tmdb_id = entry["tmdb_id"]
+        present = rail.items.pop(tmdb_id, None) is not None
+        if in_progress(entry):
+            # the newest write is always the most recently watched title
+            rail.items[tmdb_id] = {field: entry[field] for field in HISTORY_PROJECTION if field in entry}
+            if len(rail.items) > self.capacity:
+                dropped, _ = rail.items.popitem(last=False)
+                rail.cards.pop(dropped, None)
+                rail.complete = False
+        elif not present:
+            return
+        else:
+            rail.cards.pop(tmdb_id, None)
+            if len(rail.items) < self.limit and not rail.complete:
+                # an older title may now belong on the rail, but it was never loaded
+                self._invalidate(profile_id)
+                return
+        rail.version += 1
+        rail.rendered = None
+
+    def _invalidate(self, profile_id: str):
+        if self._rails.pop(profile_id, None) is not None:
+            self._stats["invalidations"] += 1
+
+    async def get(self, profile_id: str) -> Tuple[bytes, str]:
+        self._stats["served"] += 1
+        rail = self._rails.get(profile_id)
+        if rail is not None and time.monotonic() - rail.built_at > self.ttl:
+            rail = None
+        if rail is None:
+            rail = await self._loading.do(profile_id, lambda: self._build(profile_id))
+        else:
+            self._rails.move_to_end(profile_id)
+        if rail.rendered is not None:
+            return rail.rendered
+        return await self._render(rail)
+
+    async def _build(self, profile_id: str) -> Rail:
+        # served by the (profile_id, last_watched) index
+        history = await self.collection.find({"profile_id": profile_id}, HISTORY_PROJECTION) \
+            .sort("last_watched", -1).to_list(CONTINUE_WATCHING_SCAN_LIMIT)
+        complete = len(history) < CONTINUE_WATCHING_SCAN_LIMIT
+        # read through the write-behind buffer, after the query so no write slips in between
+        latest = {entry["tmdb_id"]: entry for entry in history}
+        for entry in self.progress_buffer.pending_for(profile_id):
+            latest[entry["tmdb_id"]] = {field: entry[field] for field in HISTORY_PROJECTION if field in entry}
+        items = sorted((entry for entry in latest.values() if in_progress(entry)), key=lambda entry: entry["last_watched"], reverse=True)
+        if len(items) > self.capacity:
+            items, complete = items[:self.capacity], False
+
+        rail = Rail(items, complete)
+        previous = self._rails.get(profile_id)
+        if previous is not None:
+            # keep cards already hydrated for titles still on the rail
+            rail.cards = {tmdb_id: card for tmdb_id, card in previous.cards.items() if tmdb_id in rail.items}
+        self._stats["built"] += 1
+        self._rails[profile_id] = rail
+        self._rails.move_to_end(profile_id)
+        while len(self._rails) > self.max_profiles:
+            self._rails.popitem(last=False)
+        return rail
+
+    async def _render(self, rail: Rail) -> Tuple[bytes, str]:
+        while True:
+            version = rail.version
+            items = list(reversed(rail.items.values()))[:self.limit]
+            missing = [(item["media_type"], item["tmdb_id"]) for item in items if item["tmdb_id"] not in rail.cards]
+            if not missing:
+                break
+            cards = await tmdb_service.get_cards(missing)
+            for (_, tmdb_id), card in cards.items():
+                # failed lookups aren't kept, and the title may have left the rail while the cards were loading
+                if card and tmdb_id in rail.items:
+                    rail.cards[tmdb_id] = card
+            if rail.version == version:
+                break
+            # a write landed during the await; go round again with the current items
+        results = []
+        for item in items:
+            card = rail.cards.get(item["tmdb_id"]) or {"id": item["tmdb_id"]}
+            results.append({
+                **card,
+                "media_type": item["media_type"],
+                "position": item["position"],
+                "duration": item["duration"],
+                "progress": round(progress(item), 4),
+                "last_watched": item["last_watched"],
+            })
+        body = dumps({"results": results})
+        rendered = (body, etag_for(body))
+        self._stats["rendered"] += 1
+        if all(item["tmdb_id"] in rail.cards for item in items):
+            rail.rendered = rendered
+        else:
+            # serve the bare cards for now, but retry the details on the next request
+            self._stats["partial"] += 1
+        return rendered
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "profiles": len(self._rails),
+            "limit": self.limit,
+            "min_progress": CONTINUE_WATCHING_MIN_PROGRESS,
+            "max_progress": CONTINUE_WATCHING_MAX_PROGRESS,
+        }
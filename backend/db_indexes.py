@@ -0,0 +1,56 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# collection -> [(keys, options)]
+INDEXES: Dict[str, List[Tuple[list, dict]]] = {
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True}),
+    ],
+    "profiles": [
+        ([("user_id", ASCENDING)], {"name": "user_id"}),
+    ],
+    "watchlist": [
+        ([("profile_id", ASCENDING), ("tmdb_id", ASCENDING)], {"name": "profile_title_unique", "unique": True}),
+        ([("profile_id", ASCENDING), ("added_at", DESCENDING), ("id", DESCENDING)], {"name": "profile_added_at"}),
+    ],
+    "watch_history": [
+        ([("profile_id", ASCENDING), ("tmdb_id", ASCENDING)], {"name": "profile_title_unique", "unique": True}),
+        ([("profile_id", ASCENDING), ("last_watched", DESCENDING), ("id", DESCENDING)], {"name": "profile_last_watched_id"}),
+    ],
+}
+
+# Indexes superseded by one above; dropped once their replacement exists
+OBSOLETE_INDEXES: Dict[str, List[str]] = {
+    "watch_history": ["profile_last_watched"],
+}
+INDEX_NOT_FOUND = 27
+
+# Small collections whose unique indexes guard writes; built before serving
+BLOCKING_COLLECTIONS = ("users",)
+
+async def ensure_indexes(db, collections: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+    created: Dict[str, List[str]] = {}
+    for collection in collections or INDEXES:
+        for keys, options in INDEXES[collection]:
+            try:
+                # create_index is a no-op when an identical index already exists
+                name = await db[collection].create_index(keys, background=True, **options)
+            except PyMongoError as e:
+                # e.g. existing duplicates block a unique index; keep serving without it
+                logger.warning("Could not create index %s on %s: %s", options["name"], collection, e)
+                continue
+            created.setdefault(collection, []).append(name)
+        for name in OBSOLETE_INDEXES.get(collection, ()):
+            try:
+                await db[collection].drop_index(name)
+                logger.info("Dropped obsolete index %s on %s", name, collection)
+            except OperationFailure as e:
+                if e.code != INDEX_NOT_FOUND:
+                    logger.warning("Could not drop index %s on %s: %s", name, collection, e)
+    return created
@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from cache_service import SingleFlight
+from tmdb_service import TMDB_IMAGE_BASE_URL
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", str(Path(__file__).parent / "image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+IMAGE_FETCH_TIMEOUT = float(os.environ.get("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_RESIZE_WORKERS = int(os.environ.get("IMAGE_RESIZE_WORKERS", str(min(2, os.cpu_count() or 1))))
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", "80"))
+IMAGE_MAX_DIMENSION = int(os.environ.get("IMAGE_MAX_DIMENSION", "3840"))
+
+# Sizes the TMDb image CDN renders itself
+TMDB_WIDTHS = (45, 92, 154, 185, 300, 342, 500, 780, 1280)
+TMDB_SIZES = {f"w{width}" for width in TMDB_WIDTHS} | {"h632", "original"}
+
+# Extra widths resized locally; every allowed size costs a resize and a disk entry per image,
+# so arbitrary sizes are refused rather than rendered on demand
+IMAGE_EXTRA_WIDTHS = tuple(int(width) for width in os.environ.get("IMAGE_EXTRA_WIDTHS", "120,240,400,640").split(",") if width)
+IMAGE_SIZES = TMDB_SIZES | {f"w{width}" for width in IMAGE_EXTRA_WIDTHS}
+PATH_PATTERN = re.compile(r"^[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp)$")
+
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+}
+EXTENSIONS = {content_type: ext for ext, content_type in CONTENT_TYPES.items()}
+PIL_FORMATS = {"jpeg": "JPEG", "webp": "WEBP"}
+
+class ImageNotFound(Exception):
+    pass
+
+class ImageUnavailable(Exception):
+    pass
+
+class CachedImage:
+    __slots__ = ("path", "size", "content_type", "etag")
+
+    def __init__(self, path: str, size: int, content_type: str, digest: str):
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        # a key's bytes never change (TMDb paths are content-addressed), so the key names the content
+        self.etag = f'"{digest[:32]}"'
+
+def is_valid(size: str, path: str) -> bool:
+    return size in IMAGE_SIZES and bool(PATH_PATTERN.match(path))
+
+def source_size(size: str) -> str:
+    # smallest TMDb rendition at least as large as the requested one
+    if size in TMDB_SIZES or size[0] != "w":
+        return size if size in TMDB_SIZES else "original"
+    width = int(size[1:])
+    for candidate in TMDB_WIDTHS:
+        if candidate >= width:
+            return f"w{candidate}"
+    return "original"
+
+def source_digest(size: str, path: str) -> str:
+    return hashlib.blake2b(f"{size}/{path}".encode(), digest_size=20).hexdigest()
+
+def resize(data: bytes, size: str, image_format: str, quality: int = IMAGE_QUALITY) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        if size != "original":
+            limit = min(int(size[1:]), IMAGE_MAX_DIMENSION)
+            box = (limit, IMAGE_MAX_DIMENSION) if size[0] == "w" else (IMAGE_MAX_DIMENSION, limit)
+            # draft lets the JPEG decoder downscale while decoding, which is far cheaper
+            image.draft("RGB", box)
+            image.thumbnail(box, Image.LANCZOS)
+        if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = io.BytesIO()
+        image.save(out, PIL_FORMATS[image_format], quality=quality)
+        return out.getvalue()
+
+def remove_files(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class ImageCache:
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        # digest -> CachedImage, least recently used first
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._single_flight = SingleFlight()
+        self._stats = {"hits": 0, "misses": 0, "fetches": 0, "fetch_errors": 0, "resized": 0, "evictions": 0, "vanished": 0}
+
+    @property
+    def can_resize(self) -> bool:
+        return Image is not None
+
+    async def start(self):
+        self._ensure_client()
+        if self._executor is None and self.can_resize:
+            self._executor = ThreadPoolExecutor(max_workers=IMAGE_RESIZE_WORKERS, thread_name_prefix="image-resize")
+        await asyncio.to_thread(self._scan)
+
+    def _ensure_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=TMDB_IMAGE_BASE_URL, timeout=IMAGE_FETCH_TIMEOUT)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _scan(self):
+        # rebuild the index from disk, oldest files first so they are evicted first;
+        # each worker process keeps its own index, so the size bound is per process
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                digest, _, ext = entry.name.partition(".")
+                if ext not in CONTENT_TYPES:
+                    # another worker's in-progress write
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime, digest, CachedImage(entry.path, stat.st_size, CONTENT_TYPES[ext], digest)))
+        found.sort(key=lambda item: item[0])
+        self._entries = OrderedDict((digest, image) for _, digest, image in found)
+        self.size = sum(image.size for image in self._entries.values())
+        remove_files(self._evict())
+
+    def _path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.{ext}")
+
+    def _lookup(self, digest: str) -> Optional[CachedImage]:
+        image = self._entries.get(digest)
+        if image is None:
+            return None
+        if not os.path.exists(image.path):
+            # another worker shares the directory and evicted it from its own index
+            self._forget(digest, image)
+            return None
+        self._entries.move_to_end(digest)
+        return image
+
+    def _forget(self, digest: str, image: CachedImage):
+        if self._entries.get(digest) is image:
+            del self._entries[digest]
+            self.size -= image.size
+            self._stats["vanished"] += 1
+
+    def _write(self, digest: str, body: bytes, content_type: str) -> CachedImage:
+        path = self._path(digest, EXTENSIONS[content_type])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        return CachedImage(path, len(body), content_type, digest)
+
+    async def _store(self, digest: str, body: bytes, content_type: str) -> CachedImage:
+        image = await asyncio.to_thread(self._write, digest, body, content_type)
+        previous = self._entries.pop(digest, None)
+        if previous is not None:
+            self.size -= previous.size
+        self._entries[digest] = image
+        self.size += image.size
+        evicted = self._evict()
+        if evicted:
+            await asyncio.to_thread(remove_files, evicted)
+        return image
+
+    def _evict(self) -> List[str]:
+        # index bookkeeping stays on the event loop; only the unlinks go to a thread
+        evicted = []
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, image = self._entries.popitem(last=False)
+            self.size -= image.size
+            self._stats["evictions"] += 1
+            evicted.append(image.path)
+        return evicted
+
+    async def get(self, size: str, path: str, image_format: Optional[str] = None) -> CachedImage:
+        source = source_size(size)
+        if not self.can_resize:
+            # without Pillow the closest rendition TMDb offers is served as-is
+            size, image_format = source, None
+        if size == source and image_format is None:
+            return await self._source(source, path)
+
+        # PNGs are usually logos with transparency, which JPEG would flatten
+        image_format = image_format or ("webp" if path.endswith(".png") else "jpeg")
+        key = f"{size}/{path}@{image_format}:{IMAGE_QUALITY}"
+        digest = hashlib.blake2b(key.encode(), digest_size=20).hexdigest()
+        image = self._lookup(digest)
+        if image is not None:
+            self._stats["hits"] += 1
+            return image
+        self._stats["misses"] += 1
+        return await self._single_flight.do(digest, lambda: self._variant(digest, size, source, path, image_format))
+
+    async def _variant(self, digest: str, size: str, source: str, path: str, image_format: str) -> CachedImage:
+        for attempt in range(2):
+            original = await self._source(source, path)
+            try:
+                body = await asyncio.to_thread(Path(original.path).read_bytes)
+                break
+            except FileNotFoundError:
+                # evicted (here or by another worker) while this read was waiting; fetch it again
+                self._forget(source_digest(source, path), original)
+        else:
+            raise ImageUnavailable(path)
+        loop = asyncio.get_running_loop()
+        try:
+            body = await loop.run_in_executor(self._executor, resize, body, size, image_format)
+        except Exception:
+            logger.exception("Failed to resize %s to %s", path, size)
+            return original
+        self._stats["resized"] += 1
+        return await self._store(digest, body, f"image/{image_format}")
+
+    async def _source(self, size: str, path: str) -> CachedImage:
+        digest = source_digest(size, path)
+        image = self._lookup(digest)
+        if image is not None:
+            self._stats["hits"] += 1
+            return image
+        self._stats["misses"] += 1
+        return await self._single_flight.do(digest, lambda: self._fetch(digest, size, path))
+
+    async def _fetch(self, digest: str, size: str, path: str) -> CachedImage:
+        self._ensure_client()
+        self._stats["fetches"] += 1
+        try:
+            response = await self._client.get(f"/{size}/{path}")
+        except httpx.HTTPError as e:
+            self._stats["fetch_errors"] += 1
+            logger.warning("Image fetch failed for %s/%s: %s", size, path, e)
+            raise ImageUnavailable(path) from e
+        if response.status_code == 404:
+            raise ImageNotFound(path)
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        if response.is_error or content_type not in EXTENSIONS:
+            self._stats["fetch_errors"] += 1
+            logger.warning("Image fetch failed for %s/%s: %s %s", size, path, response.status_code, content_type)
+            raise ImageUnavailable(path)
+        return await self._store(digest, response.content, content_type)
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "resize": self.can_resize,
+        }
+
+image_cache = ImageCache()
@@ -0,0 +1,277 @@
+import asyncio
+import bisect
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as Tally, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+EVENT_LOOP_LAG_INTERVAL = float(os.environ.get("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+# Requests slower than this get their event-loop stacks sampled; 0 disables the sampler
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "0"))
+SLOW_REQUEST_SAMPLE_INTERVAL = float(os.environ.get("SLOW_REQUEST_SAMPLE_INTERVAL", "0.01"))
+SLOW_REQUEST_REPORTS = int(os.environ.get("SLOW_REQUEST_REPORTS", "50"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # pymongo calls its listeners from worker threads
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            # buckets are stored per interval and exposed cumulatively
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Gauge:
+    # value is read from a callback at scrape time, so nothing is tracked on the hot path
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception:
+            logger.exception("Gauge %s failed", self.name)
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {_number(value)}"]
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Histogram(
+    "http_request_duration_seconds", "Time spent serving API requests",
+    ("method", "route", "status"),
+))
+tmdb_requests = registry.register(Histogram(
+    "tmdb_request_duration_seconds", "Time spent on upstream TMDb requests",
+    ("endpoint", "status"),
+))
+tmdb_cache = registry.register(Counter(
+    "tmdb_cache_requests_total", "TMDb lookups by cache outcome",
+    ("endpoint", "result"),
+))
+mongo_commands = registry.register(Histogram(
+    "mongo_command_duration_seconds", "Time spent on MongoDB commands",
+    ("collection", "command", "status"),
+))
+password_hashing = registry.register(Histogram(
+    "password_hash_duration_seconds", "Time spent hashing/verifying passwords, including queueing",
+    ("operation",),
+))
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a timer",
+    buckets=LAG_BUCKETS,
+))
+
+_ID_SEGMENT = re.compile(r"/\d+")
+# every endpoint shape tmdb_service requests; anything else is folded into one label
+_KNOWN_ENDPOINT = re.compile(r"(movie|tv)/(popular|\{id\})|trending/(all|movie|tv)/(day|week)|search/multi")
+
+def endpoint_label(endpoint: str) -> str:
+    # keep label cardinality bounded: movie/550 -> movie/{id}
+    label = _ID_SEGMENT.sub("/{id}", endpoint)
+    return label if _KNOWN_ENDPOINT.fullmatch(label) else "other"
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+        token = slow_requests.begin(scope) if slow_requests is not None else None
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            # the router records the matched route on the scope; unmatched paths share one label
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.observe(elapsed, scope["method"], path, status)
+            if token is not None:
+                slow_requests.end(token, path, elapsed)
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._collections: Dict[Tuple[int, int], str] = {}
+
+    def started(self, event):
+        # only the started event carries the command document, which names the collection
+        target = event.command.get(event.command_name)
+        self._collections[(event.request_id, event.operation_id)] = target if isinstance(target, str) else ""
+
+    def _finish(self, event, status: str):
+        collection = self._collections.pop((event.request_id, event.operation_id), "")
+        mongo_commands.observe(event.duration_micros / 1e6, collection, event.command_name, status)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+async def monitor_event_loop(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(loop.time() - scheduled - interval, 0.0))
+
+# Samples the event-loop thread's stack while any request is over the threshold,
+# so a slow request's report shows what was keeping the loop busy meanwhile
+class SlowRequestSampler:
+    def __init__(self, threshold: float, interval: float = SLOW_REQUEST_SAMPLE_INTERVAL,
+                 max_reports: int = SLOW_REQUEST_REPORTS):
+        self.threshold = threshold
+        self.interval = interval
+        self.reports = deque(maxlen=max_reports)
+        self._active: Dict[int, Tuple[float, Tally]] = {}
+        self._next_token = 0
+        self._loop_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._loop_thread = threading.get_ident()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="slow-request-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def begin(self, scope: Scope) -> int:
+        self._next_token += 1
+        self._active[self._next_token] = (time.perf_counter(), Tally())
+        return self._next_token
+
+    def end(self, token: int, route: str, elapsed: float):
+        _, samples = self._active.pop(token, (None, None))
+        if elapsed < self.threshold or samples is None:
+            return
+        report = {
+            "route": route,
+            "duration": round(elapsed, 4),
+            "at": time.time(),
+            "samples": sum(samples.values()),
+            "stacks": [{"count": count, "stack": stack} for stack, count in samples.most_common(5)],
+        }
+        self.reports.append(report)
+        top = report["stacks"][0]["stack"].splitlines()[-1] if report["stacks"] else "no samples"
+        logger.warning("Slow request %s took %.3fs (top frame: %s)", route, elapsed, top)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            slow = [samples for started, samples in list(self._active.values()) if now - started >= self.threshold]
+            if not slow:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_list(traceback.extract_stack(frame, limit=30)))
+            for samples in slow:
+                if len(samples) < 100 or stack in samples:
+                    samples[stack] += 1
+
+slow_requests: Optional[SlowRequestSampler] = SlowRequestSampler(SLOW_REQUEST_SECONDS) if SLOW_REQUEST_SECONDS > 0 else None
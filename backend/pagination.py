@@ -0,0 +1,42 @@
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+# Keyset pagination over (sort_field desc, id desc). Cursors are opaque to clients.
+Cursor = Tuple[str, str]
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(value: str, item_id: str) -> str:
+    raw = json.dumps([value, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, item_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(value, str) or not isinstance(item_id, str):
+        raise InvalidCursor("malformed cursor")
+    return value, item_id
+
+def keyset_filter(field: str, after: Optional[Cursor]) -> Dict:
+    if after is None:
+        return {}
+    value, item_id = after
+    return {"$or": [{field: {"$lt": value}}, {field: value, "id": {"$lt": item_id}}]}
+
+def keyset_sort(field: str) -> List[Tuple[str, int]]:
+    return [(field, -1), ("id", -1)]
+
+def is_after(item: Dict, field: str, after: Optional[Cursor]) -> bool:
+    return after is None or (item[field], item["id"]) < after
+
+def paginate(items: List[Dict], field: str, limit: int) -> Tuple[List[Dict], Optional[str]]:
+    items = sorted(items, key=lambda item: (item[field], item["id"]), reverse=True)
+    if len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    return page, encode_cursor(page[-1][field], page[-1]["id"])
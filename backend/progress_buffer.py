@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from pagination import Cursor, is_after
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes of buffered playback progress; 0 writes straight through
+WATCH_HISTORY_FLUSH_INTERVAL = float(os.environ.get("WATCH_HISTORY_FLUSH_INTERVAL", "5"))
+WATCH_HISTORY_MAX_PENDING = int(os.environ.get("WATCH_HISTORY_MAX_PENDING", "5000"))
+# Past this many buffered titles (e.g. while MongoDB is down) updates are written straight through
+WATCH_HISTORY_MAX_BUFFERED = int(os.environ.get("WATCH_HISTORY_MAX_BUFFERED", "50000"))
+# Flushes an update may fail before it is dropped
+WATCH_HISTORY_MAX_ATTEMPTS = int(os.environ.get("WATCH_HISTORY_MAX_ATTEMPTS", "5"))
+
+DUPLICATE_KEY = 11000
+
+def progress_update(entry: Dict) -> Tuple[Dict, Dict]:
+    key = {"profile_id": entry["profile_id"], "tmdb_id": entry["tmdb_id"]}
+    update = {
+        "$set": {
+            "position": entry["position"],
+            "duration": entry["duration"],
+            "last_watched": entry["last_watched"],
+        },
+        "$setOnInsert": {"id": entry["id"], "media_type": entry["media_type"]},
+    }
+    return key, update
+
+def merge_pending(items: List[Dict], pending: Dict[int, Dict], stored: Dict[int, Dict],
+                  after: Optional[Cursor], fields: Iterable[str]) -> List[Dict]:
+    # buffered titles replace their stored rows; stored maps tmdb_id -> the row's id/media_type,
+    # so a title reports the same id before and after its flush
+    merged = [item for item in items if item["tmdb_id"] not in pending]
+    for tmdb_id, entry in pending.items():
+        entry = {field: entry[field] for field in fields if field in entry}
+        if tmdb_id in stored:
+            entry.update(id=stored[tmdb_id]["id"], media_type=stored[tmdb_id]["media_type"])
+        if is_after(entry, "last_watched", after):
+            merged.append(entry)
+    return merged
+
+class ProgressBuffer:
+    def __init__(self, collection, flush_interval: float = WATCH_HISTORY_FLUSH_INTERVAL, max_pending: int = WATCH_HISTORY_MAX_PENDING,
+                 max_buffered: int = WATCH_HISTORY_MAX_BUFFERED, max_attempts: int = WATCH_HISTORY_MAX_ATTEMPTS):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_buffered = max_buffered
+        self.max_attempts = max_attempts
+        self._pending: Dict[Tuple[str, int], Dict] = {}
+        # failed flushes per buffered title, cleared once it is written
+        self._attempts: Dict[Tuple[str, int], int] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+        self._stats = {"updates": 0, "collapsed": 0, "flushes": 0, "written": 0, "errors": 0, "overflow": 0, "dropped": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_interval > 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+            self._flushing = None
+        await self.flush()
+
+    def add(self, entry: Dict) -> bool:
+        # False when the buffer is full; the caller then writes the update itself
+        key = (entry["profile_id"], entry["tmdb_id"])
+        previous = self._pending.get(key)
+        if previous is None and len(self._pending) >= self.max_buffered:
+            self._stats["overflow"] += 1
+            return False
+        if previous is not None:
+            self._stats["collapsed"] += 1
+            # keep the id/media_type of the first buffered write for $setOnInsert
+            entry = {**entry, "id": previous["id"], "media_type": previous["media_type"]}
+        self._pending[key] = entry
+        self._stats["updates"] += 1
+        if len(self._pending) >= self.max_pending and not self._lock.locked() \
+                and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.create_task(self.flush())
+        return True
+
+    def pending_for(self, profile_id: str) -> List[Dict]:
+        return [dict(entry) for (pid, _), entry in self._pending.items() if pid == profile_id]
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._stats["flushes"] += 1
+            keys = list(batch)
+            try:
+                failed = await self.write(list(batch.values()))
+            except PyMongoError:
+                self._stats["errors"] += 1
+                logger.exception("Failed to flush %d watch history updates", len(batch))
+                failed = {index: "Write failed" for index in range(len(keys))}
+            for index, key in enumerate(keys):
+                if index not in failed:
+                    self._attempts.pop(key, None)
+            self._requeue({keys[index]: batch[keys[index]] for index in failed})
+
+    def _requeue(self, batch: Dict[Tuple[str, int], Dict]):
+        # failed updates go back into the buffer unless a newer one arrived meanwhile,
+        # and are dropped once they have failed max_attempts flushes
+        for key, entry in batch.items():
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts >= self.max_attempts:
+                self._attempts.pop(key, None)
+                self._stats["dropped"] += 1
+                logger.error("Dropping watch history update for %s after %d failed flushes", key, attempts)
+                continue
+            self._attempts[key] = attempts
+            self._pending.setdefault(key, entry)
+
+    async def write(self, entries: List[Dict]) -> Dict[int, str]:
+        # one unordered bulk upsert; returns an error message per entry that could not be written
+        ops = [UpdateOne(*progress_update(entry), upsert=True) for entry in entries]
+        failed: Dict[int, str] = {}
+        try:
+            await self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            failed = await self._retry_duplicates(entries, e.details.get("writeErrors", []))
+        self._stats["written"] += len(ops) - len(failed)
+        return failed
+
+    async def _retry_duplicates(self, entries: List[Dict], errors: List[Dict]) -> Dict[int, str]:
+        failed: Dict[int, str] = {}
+        retry, indexes = [], []
+        for error in errors:
+            if error.get("code") == DUPLICATE_KEY:
+                # a concurrent upsert inserted the row first; update it in place
+                key, update = progress_update(entries[error["index"]])
+                retry.append(UpdateOne(key, {"$set": update["$set"]}))
+                indexes.append(error["index"])
+            else:
+                self._stats["errors"] += 1
+                logger.error("Watch history write failed: %s", error.get("errmsg"))
+                failed[error["index"]] = error.get("errmsg") or "Write failed"
+        if retry:
+            try:
+                await self.collection.bulk_write(retry, ordered=False)
+            except PyMongoError:
+                self._stats["errors"] += 1
+                logger.exception("Failed to retry %d watch history updates", len(retry))
+                failed.update((index, "Write failed") for index in indexes)
+        return failed
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Watch history flush loop error")
+
+    def stats(self) -> Dict:
+        return {**self._stats, "pending": len(self._pending), "flush_interval": self.flush_interval}
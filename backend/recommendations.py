@@ -0,0 +1,288 @@
+import logging
+import math
+import os
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from cache_service import SingleFlight
+from tmdb_service import tmdb_service, to_card
+
+logger = logging.getLogger(__name__)
+
+# Width of the hashed genre/keyword feature space
+RECOMMENDATIONS_DIMENSIONS = int(os.environ.get("RECOMMENDATIONS_DIMENSIONS", "512"))
+RECOMMENDATIONS_MAX_PROFILES = int(os.environ.get("RECOMMENDATIONS_MAX_PROFILES", "10000"))
+# Titles with a feature row (about 2 KB each at 512 dimensions); the least recently seen row is reused past this
+RECOMMENDATIONS_MAX_TITLES = int(os.environ.get("RECOMMENDATIONS_MAX_TITLES", "20000"))
+# Each worker keeps its own tastes; this bounds how long writes made through another worker go unseen
+RECOMMENDATIONS_TTL = float(os.environ.get("RECOMMENDATIONS_TTL", "60"))
+RECOMMENDATIONS_HISTORY_LIMIT = int(os.environ.get("RECOMMENDATIONS_HISTORY_LIMIT", "5000"))
+# Watched titles without known features whose details are fetched when a profile is first built
+RECOMMENDATIONS_HYDRATE_LIMIT = int(os.environ.get("RECOMMENDATIONS_HYDRATE_LIMIT", "20"))
+# Only the most-watched titles are considered when explaining a recommendation
+RECOMMENDATIONS_BECAUSE_LIMIT = int(os.environ.get("RECOMMENDATIONS_BECAUSE_LIMIT", "200"))
+
+GENRE_WEIGHT = 1.0
+KEYWORD_WEIGHT = 0.5
+# Small popularity prior so ties between equally similar titles favour well-known ones
+POPULARITY_WEIGHT = 0.02
+# Even a title abandoned early says a little about the profile's taste
+MIN_WATCH_WEIGHT = 0.1
+
+Key = Tuple[str, int]
+
+def watch_weight(entry: Dict) -> float:
+    duration = entry.get("duration") or 0
+    if duration <= 0:
+        return MIN_WATCH_WEIGHT
+    return max(min(entry.get("position", 0) / duration, 1.0), MIN_WATCH_WEIGHT)
+
+def title_features(data: Dict) -> List[Tuple[str, float]]:
+    features = [(f"g:{genre_id}", GENRE_WEIGHT) for genre_id in data.get("genre_ids") or ()]
+    features += [(f"g:{genre['id']}", GENRE_WEIGHT) for genre in data.get("genres") or () if "id" in genre]
+    keywords = data.get("keywords") or {}
+    # movies list them under "keywords", tv under "results"
+    for keyword in keywords.get("keywords") or keywords.get("results") or ():
+        if "id" in keyword:
+            features.append((f"k:{keyword['id']}", KEYWORD_WEIGHT))
+    return features
+
+class ProfileTaste:
+    __slots__ = ("vector", "weights", "unresolved", "version", "cached", "built_at")
+
+    def __init__(self, dimensions: int):
+        self.vector = np.zeros(dimensions, dtype=np.float32)
+        # title -> weight currently folded into vector, so a new write replaces the old contribution
+        self.weights: Dict[Key, float] = {}
+        # watched titles whose features are not known yet
+        self.unresolved: Dict[Key, float] = {}
+        self.version = 0
+        self.cached: Optional[Tuple[Tuple[int, int, int], List[Dict]]] = None
+        self.built_at = time.monotonic()
+
+class Recommender:
+    def __init__(self, collection, dimensions: int = RECOMMENDATIONS_DIMENSIONS,
+                 max_profiles: int = RECOMMENDATIONS_MAX_PROFILES, max_titles: int = RECOMMENDATIONS_MAX_TITLES,
+                 ttl: float = RECOMMENDATIONS_TTL):
+        self.collection = collection
+        self.dimensions = dimensions
+        self.max_profiles = max_profiles
+        self.max_titles = max_titles
+        self.ttl = ttl
+        # one L2-normalized feature row per known title, grown by doubling up to max_titles
+        capacity = min(1024, max_titles)
+        self._matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        self._popularity = np.zeros(capacity, dtype=np.float32)
+        # title -> row, least recently seen first
+        self._rows: "OrderedDict[Key, int]" = OrderedDict()
+        self._keys: List[Key] = []
+        self._cards: List[Dict] = []
+        self._feature_count: List[int] = []
+        self._catalog_version = 0
+        self._profiles: "OrderedDict[str, ProfileTaste]" = OrderedDict()
+        self._loading = SingleFlight()
+        # profile -> writes recorded while its taste is being built, folded in when the build finishes
+        self._building: Dict[str, Dict[Key, float]] = {}
+        self._stats = {"served": 0, "cached": 0, "profiles_built": 0, "incremental_updates": 0, "titles_evicted": 0}
+
+    def _column(self, feature: str) -> int:
+        # stable across processes, unlike hash()
+        return zlib.crc32(feature.encode()) % self.dimensions
+
+    def add_payload(self, endpoint: str, data: Dict):
+        section = endpoint.split("/", 1)[0]
+        if section == "search":
+            # arbitrary user queries would churn the catalog with titles nobody browses
+            return
+        default_type = section if section in ("movie", "tv") else None
+        items = data.get("results") if "results" in data else [data]
+        for item in items or ():
+            media_type = item.get("media_type") or default_type
+            if media_type in ("movie", "tv") and item.get("id") is not None:
+                self.add_title(media_type, item)
+
+    def add_title(self, media_type: str, item: Dict):
+        features = title_features(item)
+        if not features:
+            return
+        key = (media_type, item["id"])
+        row = self._rows.get(key)
+        if row is not None:
+            self._rows.move_to_end(key)
+        # list items only carry genre ids; never let them overwrite richer details features
+        if row is not None and len(features) < self._feature_count[row]:
+            return
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in features:
+            vector[self._column(feature)] += weight
+        vector /= np.linalg.norm(vector)
+        card = to_card(item, media_type)
+        if row is None and len(self._keys) >= self.max_titles:
+            # reuse the least recently seen title's row
+            _, row = self._rows.popitem(last=False)
+            self._stats["titles_evicted"] += 1
+            self._rows[key] = row
+            self._keys[row] = key
+            self._cards[row] = card
+            self._feature_count[row] = len(features)
+        elif row is None:
+            row = len(self._keys)
+            if row == len(self._matrix):
+                grow = min(len(self._matrix), self.max_titles - len(self._matrix))
+                self._matrix = np.concatenate([self._matrix, np.zeros((grow, self.dimensions), dtype=np.float32)])
+                self._popularity = np.concatenate([self._popularity, np.zeros(grow, dtype=np.float32)])
+            self._rows[key] = row
+            self._keys.append(key)
+            self._cards.append(card)
+            self._feature_count.append(len(features))
+        else:
+            # tastes that already folded in the old row keep it until the profile is rebuilt
+            self._cards[row] = card
+            self._feature_count[row] = len(features)
+        self._matrix[row] = vector
+        self._popularity[row] = math.log1p(item.get("popularity") or 0)
+        self._catalog_version += 1
+
+    def _fold(self, taste: ProfileTaste, key: Key, weight: float):
+        previous = taste.weights.get(key, 0.0)
+        row = self._rows.get(key)
+        if row is None:
+            taste.unresolved[key] = weight
+            return
+        taste.unresolved.pop(key, None)
+        if weight != previous:
+            taste.vector += (weight - previous) * self._matrix[row]
+            taste.weights[key] = weight
+            taste.version += 1
+
+    def record(self, profile_id: str, entry: Dict):
+        # keep an already-built taste vector current instead of rebuilding it from Mongo
+        key, weight = (entry["media_type"], entry["tmdb_id"]), watch_weight(entry)
+        queued = self._building.get(profile_id)
+        if queued is not None:
+            # the build may have read the history before this write landed
+            queued[key] = weight
+        taste = self._profiles.get(profile_id)
+        if taste is None:
+            return
+        self._fold(taste, key, weight)
+        self._stats["incremental_updates"] += 1
+
+    async def _profile(self, profile_id: str, pending: Iterable[Dict]) -> ProfileTaste:
+        taste = self._profiles.get(profile_id)
+        if taste is not None and time.monotonic() - taste.built_at <= self.ttl:
+            self._profiles.move_to_end(profile_id)
+            return taste
+        pending = list(pending)
+        return await self._loading.do(profile_id, lambda: self._build(profile_id, pending))
+
+    async def _build(self, profile_id: str, pending: List[Dict]) -> ProfileTaste:
+        self._building[profile_id] = {}
+        try:
+            history = await self.collection.find(
+                {"profile_id": profile_id},
+                {"_id": 0, "tmdb_id": 1, "media_type": 1, "position": 1, "duration": 1},
+            ).sort("last_watched", -1).to_list(RECOMMENDATIONS_HISTORY_LIMIT)
+            weights: Dict[Key, float] = {}
+            for entry in history + pending:
+                weights[(entry["media_type"], entry["tmdb_id"])] = watch_weight(entry)
+
+            missing = [key for key in weights if key not in self._rows][:RECOMMENDATIONS_HYDRATE_LIMIT]
+            if missing:
+                await self._hydrate(missing)
+        finally:
+            queued = self._building.pop(profile_id)
+        # nothing below awaits, so no write can slip in between this and registering the taste
+        weights.update(queued)
+
+        taste = ProfileTaste(self.dimensions)
+        known = [(self._rows[key], key, weight) for key, weight in weights.items() if key in self._rows]
+        if known:
+            rows = np.fromiter((row for row, _, _ in known), dtype=np.int64, count=len(known))
+            values = np.fromiter((weight for _, _, weight in known), dtype=np.float32, count=len(known))
+            taste.vector = values @ self._matrix[rows]
+            taste.weights = {key: weight for _, key, weight in known}
+        taste.unresolved = {key: weight for key, weight in weights.items() if key not in self._rows}
+        self._stats["profiles_built"] += 1
+
+        self._profiles[profile_id] = taste
+        self._profiles.move_to_end(profile_id)
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        return taste
+
+    async def _hydrate(self, keys: List[Key]):
+        details = await tmdb_service.get_many_details(keys)
+        for (media_type, _), data in details.items():
+            if data:
+                # a cache hit doesn't reach the catalog listeners, so index it explicitly
+                self.add_title(media_type, data)
+
+    async def recommend(self, profile_id: str, pending: Iterable[Dict] = (), limit: int = 20) -> List[Dict]:
+        taste = await self._profile(profile_id, pending)
+        for key, weight in list(taste.unresolved.items()):
+            if key in self._rows:
+                self._fold(taste, key, weight)
+
+        version = (taste.version, self._catalog_version, limit)
+        if taste.cached is not None and taste.cached[0] == version:
+            self._stats["cached"] += 1
+            return taste.cached[1]
+        self._stats["served"] += 1
+        results = self._rank(taste, limit)
+        taste.cached = (version, results)
+        return results
+
+    def _rank(self, taste: ProfileTaste, limit: int) -> List[Dict]:
+        count = len(self._keys)
+        norm = float(np.linalg.norm(taste.vector))
+        if count == 0 or norm == 0:
+            return []
+        matrix = self._matrix[:count]
+        # rows are unit vectors, so one matrix-vector product gives every cosine similarity
+        scores = matrix @ (taste.vector / norm)
+        scores += POPULARITY_WEIGHT * self._popularity[:count]
+        # a watched title whose row was evicted can't be recommended anyway
+        seen = [self._rows[key] for key in taste.weights if key in self._rows]
+        scores[seen] = -np.inf
+        limit = min(limit, count - len(seen))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+
+        # explain each pick with the most similar of the profile's most-watched titles
+        watched = sorted(
+            ((key, weight) for key, weight in taste.weights.items() if key in self._rows),
+            key=lambda item: item[1], reverse=True,
+        )[:RECOMMENDATIONS_BECAUSE_LIMIT]
+        watched_rows = np.array([self._rows[key] for key, _ in watched], dtype=np.int64)
+        # every watched title may have been evicted since the taste was built
+        because = np.argmax(matrix[top] @ matrix[watched_rows].T, axis=1).tolist() if watched else [None] * len(top)
+
+        results = []
+        for row, reason in zip(top.tolist(), because):
+            card = dict(self._cards[row])
+            card["score"] = round(float(scores[row]), 4)
+            card["because"] = None
+            if reason is not None:
+                source = self._cards[watched_rows[reason]]
+                card["because"] = {
+                    "tmdb_id": source["id"],
+                    "media_type": source.get("media_type"),
+                    "title": source.get("title") or source.get("name"),
+                }
+            results.append(card)
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "titles": len(self._keys),
+            "profiles": len(self._profiles),
+            "dimensions": self.dimensions,
+        }
@@ -0,0 +1,96 @@
+import json
+from typing import Any, Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import JSONResponse, Response
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    # Routes should return this directly: FastAPI only skips jsonable_encoder for Response objects
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class RawJSONResponse(Response):
+    # Body is already-encoded JSON (e.g. cached upstream bytes) and is sent untouched
+    media_type = "application/json"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+def cache_control(max_age: float, stale_while_revalidate: float = 0) -> str:
+    value = f"public, max-age={max(int(max_age), 0)}"
+    if stale_while_revalidate > 0:
+        value += f", stale-while-revalidate={int(stale_while_revalidate)}"
+    return value
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    # Only single "bytes=" ranges are served partially; anything else gets the whole file.
+    # Raises ValueError when the range cannot be satisfied.
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[6:].strip().partition("-")
+    try:
+        if not first:
+            # suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError(range_header)
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise ValueError(range_header)
+    return start, min(end, size - 1)
+
+class FileRangeResponse(Response):
+    # Starlette's FileResponse always sends the whole file; this streams one byte range as a 206
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, start: int, end: int, size: int, media_type: str,
+                 headers: Optional[Mapping[str, str]] = None):
+        self.path = path
+        self.start = start
+        self.end = end
+        headers = {
+            **(headers or {}),
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+            "Accept-Ranges": "bytes",
+        }
+        super().__init__(status_code=206, headers=headers, media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # file shrank underneath us; end the response rather than hang the client
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
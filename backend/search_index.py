@@ -0,0 +1,270 @@
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_ENABLED = os.environ.get("SEARCH_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+# Where the index is persisted for warm starts; empty disables persistence
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", str(Path(__file__).parent / "search_index.json"))
+SEARCH_INDEX_SAVE_INTERVAL = float(os.environ.get("SEARCH_INDEX_SAVE_INTERVAL", "300"))
+SEARCH_INDEX_MAX_TITLES = int(os.environ.get("SEARCH_INDEX_MAX_TITLES", "50000"))
+# A query is answered locally only when the index has at least this many matches
+SEARCH_INDEX_MIN_RESULTS = int(os.environ.get("SEARCH_INDEX_MIN_RESULTS", "5"))
+SEARCH_INDEX_MIN_SIMILARITY = float(os.environ.get("SEARCH_INDEX_MIN_SIMILARITY", "0.35"))
+# Browser lifetime of locally answered results: the index keeps growing, so keep it short
+SEARCH_INDEX_MAX_AGE = int(os.environ.get("SEARCH_INDEX_MAX_AGE", "60"))
+SEARCH_PAGE_SIZE = 20
+
+INDEX_VERSION = 1
+MEDIA_TYPES = ("movie", "tv")
+# Fields kept per title: enough to render a card and rank it
+INDEXED_FIELDS = (
+    "id", "media_type", "title", "name", "original_title", "original_name", "overview",
+    "poster_path", "backdrop_path", "release_date", "first_air_date", "vote_average", "popularity",
+)
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+def normalize(text: str) -> str:
+    # "Amélie!" -> "amelie": fold accents and punctuation so type-ahead matches loosely
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex:
+    def __init__(self, path: str = SEARCH_INDEX_PATH, max_titles: int = SEARCH_INDEX_MAX_TITLES,
+                 save_interval: float = SEARCH_INDEX_SAVE_INTERVAL):
+        self.path = path
+        self.max_titles = max_titles
+        self.save_interval = save_interval
+        self._titles: Dict[str, Dict] = {}
+        # key -> (normalized title, tokens, trigrams) so updates can drop stale postings
+        self._terms: Dict[str, Tuple[str, Set[str], Set[str]]] = {}
+        self._tokens: Dict[str, Set[str]] = {}
+        self._sorted_tokens: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"local_hits": 0, "fallbacks": 0, "saves": 0, "skipped_full": 0}
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    async def start(self):
+        if self.path:
+            await asyncio.to_thread(self.load)
+            if self.save_interval > 0 and self._task is None:
+                self._task = asyncio.create_task(self._save_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.path and self._dirty:
+            await self.persist()
+
+    async def _save_loop(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            if self._dirty:
+                try:
+                    await self.persist()
+                except Exception:
+                    logger.exception("Failed to persist search index")
+
+    def load(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable search index %s: %s", self.path, e)
+            return 0
+        if payload.get("version") != INDEX_VERSION:
+            return 0
+        added = self.add_titles(payload.get("titles") or [])
+        self._dirty = False
+        return added
+
+    async def persist(self):
+        # snapshot on the loop, where add() runs, and only serialize in the worker thread
+        payload = self._snapshot()
+        await asyncio.to_thread(self._write, payload)
+
+    def save(self):
+        self._write(self._snapshot())
+
+    def _snapshot(self) -> Dict:
+        self._dirty = False
+        return {"version": INDEX_VERSION, "titles": list(self._titles.values())}
+
+    def _write(self, payload: Dict):
+        # every worker saves the same index; a shared temp name would let their writes interleave
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._stats["saves"] += 1
+
+    def add_payload(self, endpoint: str, data) -> int:
+        if not isinstance(data, dict):
+            return 0
+        # movie/popular and movie/{id} items carry no media_type of their own
+        section = endpoint.split("/", 1)[0]
+        default_type = section if section in MEDIA_TYPES else None
+        if "results" in data:
+            return self.add_titles(data.get("results") or [], default_type)
+        return self.add_titles([data], default_type)
+
+    def add_titles(self, items: Iterable[Dict], media_type: Optional[str] = None) -> int:
+        added = 0
+        for item in items:
+            if self.add(item, media_type):
+                added += 1
+        return added
+
+    def add(self, item: Dict, media_type: Optional[str] = None) -> bool:
+        media_type = item.get("media_type") or media_type
+        if media_type not in MEDIA_TYPES or item.get("id") is None:
+            return False
+        name = item.get("title") or item.get("name")
+        if not name:
+            return False
+        key = f"{media_type}:{item['id']}"
+        if key not in self._titles and len(self._titles) >= self.max_titles:
+            self._stats["skipped_full"] += 1
+            return False
+
+        doc = {field: item[field] for field in INDEXED_FIELDS if item.get(field) is not None}
+        doc["media_type"] = media_type
+        previous = self._titles.get(key)
+        if previous is not None and "popularity" not in doc and "popularity" in previous:
+            # details payloads carry popularity too, but keep the list value if one is missing
+            doc["popularity"] = previous["popularity"]
+        self._titles[key] = doc
+        self._dirty = True
+
+        original = item.get("original_title") or item.get("original_name") or ""
+        title = normalize(name)
+        tokens = set(title.split()) | set(normalize(original).split())
+        grams = trigrams(title)
+        old = self._terms.get(key)
+        if old is not None and old[1] == tokens:
+            return True
+        if old is not None:
+            self._unindex(key, old)
+        self._terms[key] = (title, tokens, grams)
+        for token in tokens:
+            postings = self._tokens.get(token)
+            if postings is None:
+                postings = self._tokens[token] = set()
+                bisect.insort(self._sorted_tokens, token)
+            postings.add(key)
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(key)
+        return True
+
+    def _unindex(self, key: str, terms: Tuple[str, Set[str], Set[str]]):
+        _, tokens, grams = terms
+        for token in tokens:
+            postings = self._tokens.get(token)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._tokens[token]
+                    index = bisect.bisect_left(self._sorted_tokens, token)
+                    del self._sorted_tokens[index]
+        for gram in grams:
+            postings = self._trigrams.get(gram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._trigrams[gram]
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        keys: Set[str] = set()
+        start = bisect.bisect_left(self._sorted_tokens, prefix)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            keys |= self._tokens[token]
+        return keys
+
+    def search(self, query: str, limit: int = SEARCH_PAGE_SIZE) -> List[Dict]:
+        text = normalize(query)
+        if not text:
+            return []
+        scores: Dict[str, float] = {}
+
+        # every query word must prefix some word of the title ("dark kni" -> "The Dark Knight")
+        candidates: Optional[Set[str]] = None
+        for token in sorted(set(text.split()), key=len, reverse=True):
+            matches = self._prefix_matches(token)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+        for key in candidates or ():
+            quality = 1.0
+            if self._terms[key][0].startswith(text):
+                quality += 0.5
+            scores[key] = quality
+
+        # typo tolerance: fall back to trigram similarity for whatever prefixes missed
+        if len(scores) < limit and len(text) >= 3:
+            query_grams = trigrams(text)
+            shared: Dict[str, int] = {}
+            for gram in query_grams:
+                for key in self._trigrams.get(gram, ()):
+                    shared[key] = shared.get(key, 0) + 1
+            for key, count in shared.items():
+                if key in scores:
+                    continue
+                similarity = count / (len(query_grams) + len(self._terms[key][2]) - count)
+                if similarity >= SEARCH_INDEX_MIN_SIMILARITY:
+                    scores[key] = similarity * 0.8
+
+        ranked = sorted(
+            scores,
+            key=lambda key: scores[key] * (1 + math.log1p(self._titles[key].get("popularity") or 0)),
+            reverse=True,
+        )
+        return [self._titles[key] for key in ranked[:limit]]
+
+    def page(self, query: str, min_results: int = SEARCH_INDEX_MIN_RESULTS) -> Optional[Dict]:
+        # first page of results in TMDb's search shape, or None when TMDb should answer instead
+        results = self.search(query, SEARCH_PAGE_SIZE + 1)
+        if len(results) < max(min_results, 1):
+            self._stats["fallbacks"] += 1
+            return None
+        self._stats["local_hits"] += 1
+        more = len(results) > SEARCH_PAGE_SIZE
+        results = results[:SEARCH_PAGE_SIZE]
+        return {
+            "page": 1,
+            "results": results,
+            # a full page leaves room for deeper pages, which are fetched from TMDb
+            "total_pages": 2 if more else 1,
+            "total_results": len(results) + (1 if more else 0),
+        }
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "titles": len(self._titles),
+            "tokens": len(self._tokens),
+            "trigrams": len(self._trigrams),
+            "persisted": bool(self.path),
+        }
@@ -1,28 +1,72 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+import hmac
 import os
 import logging
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, model_validator
+from typing import List, Literal, Optional
 import uuid
 from datetime import datetime, timezone
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-from auth_service import verify_password, get_password_hash, create_access_token, decode_token
-from tmdb_service import tmdb_service
+from auth_service import (
+    verify_password_async, get_password_hash_async, create_access_token, decode_token,
+    PasswordHasherBusy, password_hasher_stats, shutdown_password_hasher,
+)
+from tmdb_service import SELECTABLE_FIELDS, tmdb_service, to_cards
+from catalog_snapshot import CATALOG_SNAPSHOT_PATH
+from cache_service import CacheEntry, LRUCache, TTLCache
+from db_indexes import BLOCKING_COLLECTIONS, INDEXES, ensure_indexes
+from progress_buffer import DUPLICATE_KEY, ProgressBuffer, merge_pending, progress_update
+from recommendations import Recommender
+from continue_watching import ContinueWatching
+from responses import FastJSONResponse, FileRangeResponse, RawJSONResponse, cache_control, dumps, etag_matches, parse_range
+from image_cache import ImageNotFound, ImageUnavailable, image_cache, is_valid as is_valid_image
+from compression import COMPRESSION_MIN_SIZE, CompressionMiddleware, negotiate, weak_etag
+from pagination import InvalidCursor, decode_cursor, keyset_filter, keyset_sort, paginate
+from metrics import (
+    METRICS_ENABLED, Gauge, MetricsMiddleware, MongoCommandListener, monitor_event_loop, registry, slow_requests,
+)
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener()] if METRICS_ENABLED else [])
 db = client[os.environ['DB_NAME']]
+progress_buffer = ProgressBuffer(db.watch_history)
+recommender = Recommender(db.watch_history)
+continue_watching = ContinueWatching(db.watch_history, progress_buffer)
+tmdb_service.add_listener(recommender.add_payload)
+
+# Verified principals are reused for a short window to skip the users lookup
+principal_cache = TTLCache(
+    max_entries=int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.environ.get("AUTH_CACHE_TTL", "30")),
+)
+
+# Upper bound on operations accepted by a single batch request
+BATCH_MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", "500"))
+
+# Operational stats expose internals (stack traces, file paths, cache sizes); they are
+# only served to callers sending this token in X-Stats-Token, and disabled when it is unset
+STATS_TOKEN = os.environ.get("STATS_TOKEN", "")
+
+async def require_stats_token(x_stats_token: Optional[str] = Header(None)):
+    if not STATS_TOKEN or not hmac.compare_digest((x_stats_token or "").encode(), STATS_TOKEN.encode()):
+        raise HTTPException(status_code=404, detail="Not Found")
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
+stats_router = APIRouter(prefix="/api/stats", dependencies=[Depends(require_stats_token)])
 security = HTTPBearer()
 
 # Models
@@ -34,6 +78,12 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     subscription_plan: str = "free"
 
+class Principal(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    email: str
+    subscription_plan: str = "free"
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
@@ -87,6 +137,23 @@ class WatchHistoryUpdate(BaseModel):
     position: int
     duration: int
 
+class WatchlistOperation(BaseModel):
+    op: Literal["add", "remove"]
+    tmdb_id: int
+    media_type: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_media_type(self):
+        if self.op == "add" and not self.media_type:
+            raise ValueError("media_type is required to add a title")
+        return self
+
+class WatchlistBatch(BaseModel):
+    operations: List[WatchlistOperation] = Field(min_length=1, max_length=BATCH_MAX_OPERATIONS)
+
+class WatchHistoryBatch(BaseModel):
+    updates: List[WatchHistoryUpdate] = Field(min_length=1, max_length=BATCH_MAX_OPERATIONS)
+
 # Auth dependency
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
@@ -97,30 +164,50 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "id": 1, "email": 1, "subscription_plan": 1})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
+    principal = Principal(**user)
+    principal_cache.set(user_id, principal)
+    return principal
+
+# Nothing updates or deletes users yet; any route that does must call this so a
+# changed plan or removed account isn't served from the cache for up to AUTH_CACHE_TTL
+def invalidate_principal(user_id: str):
+    principal_cache.delete(user_id)
 
 # Auth routes
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserCreate):
     try:
-        existing = await db.users.find_one({"email": user_data.email}, {"_id": 0})
-        if existing:
+        # cheap check first so a known email never costs a hash; the unique index
+        # still catches concurrent sign-ups, and this covers a failed index build
+        if await db.users.find_one({"email": user_data.email}, {"_id": 1}):
             raise HTTPException(status_code=400, detail="Email already registered")
 
         user = User(
             email=user_data.email,
-            hashed_password=get_password_hash(user_data.password)
+            hashed_password=await get_password_hash_async(user_data.password)
         )
 
         doc = user.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
-        await db.users.insert_one(doc)
+        try:
+            # the unique email index rejects duplicates atomically
+            await db.users.insert_one(doc)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Email already registered")
 
         token = create_access_token({"user_id": user.id})
         return Token(access_token=token)
+    except HTTPException:
+        raise
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many sign-up attempts, try again shortly", headers={"Retry-After": "1"})
     except Exception as e:
         logger.exception("Error in register endpoint")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -129,24 +216,26 @@ async def register(user_data: UserCreate):
 async def login(credentials: UserLogin):
     try:
         user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-        if not user or not verify_password(credentials.password, user["hashed_password"]):
+        if not user or not await verify_password_async(credentials.password, user["hashed_password"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
         token = create_access_token({"user_id": user["id"]})
         return Token(access_token=token)
     except HTTPException:
         raise
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many login attempts, try again shortly", headers={"Retry-After": "1"})
     except Exception:
         logger.exception("Error in login endpoint")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.get("/auth/me")
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: Principal = Depends(get_current_user)):
     return {"email": current_user.email, "id": current_user.id, "subscription_plan": current_user.subscription_plan}
 
 # Profile routes
 @api_router.post("/profiles", response_model=Profile)
-async def create_profile(profile_data: ProfileCreate, current_user: User = Depends(get_current_user)):
+async def create_profile(profile_data: ProfileCreate, current_user: Principal = Depends(get_current_user)):
     profile = Profile(
         user_id=current_user.id,
         name=profile_data.name,
@@ -159,7 +248,7 @@ async def create_profile(profile_data: ProfileCreate, current_user: User = Depen
     return profile
 
 @api_router.get("/profiles", response_model=List[Profile])
-async def get_profiles(current_user: User = Depends(get_current_user)):
+async def get_profiles(current_user: Principal = Depends(get_current_user)):
     profiles = await db.profiles.find({"user_id": current_user.id}, {"_id": 0}).to_list(100)
     for p in profiles:
         if isinstance(p.get('created_at'), str):
@@ -167,93 +256,375 @@ async def get_profiles(current_user: User = Depends(get_current_user)):
     return profiles
 
 # TMDb routes
-@api_router.get("/titles/popular")
-async def get_popular(media_type: str = "movie", page: int = 1):
+def passthrough(entry, request: Request) -> Response:
+    if entry is None:
+        return RawJSONResponse(b"null", headers={"Cache-Control": "no-store"})
+    # browser/CDN lifetimes follow what is left of the server-side TTL
+    if entry.is_fresh():
+        control = cache_control(entry.ttl, entry.stale_until - entry.expires_at)
+    else:
+        control = cache_control(0, entry.stale_until - time.time())
+    encoding = negotiate(request.headers.get("accept-encoding")) if entry.size >= COMPRESSION_MIN_SIZE else None
+    headers = {"ETag": entry.etag, "Cache-Control": control, "Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["ETag"] = weak_etag(entry.etag)
+        headers["Content-Encoding"] = encoding
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    # cached upstream bytes (or their stored compressed variant) go out as-is
+    return RawJSONResponse(entry.encoded(encoding), headers=headers)
+
+def title_view(view: Literal["card", "full"] = "full", fields: Optional[str] = None) -> dict:
+    # fields is normalized so equivalent requests share one cached projection
+    selected = tuple(sorted({f.strip() for f in fields.split(",") if f.strip()})) if fields else None
+    unknown = [field for field in selected or () if field not in SELECTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return {"raw": True, "view": view, "fields": selected}
+
+@api_router.get("/titles/popular", response_class=RawJSONResponse)
+async def get_popular(request: Request, media_type: str = "movie", page: int = 1, options: dict = Depends(title_view)):
     if media_type == "movie":
-        data = await tmdb_service.get_popular_movies(page)
+        entry = await tmdb_service.get_popular_movies(page, **options)
     else:
-        data = await tmdb_service.get_popular_tv(page)
-    return data
+        entry = await tmdb_service.get_popular_tv(page, **options)
+    return passthrough(entry, request)
+
+@api_router.get("/titles/trending", response_class=RawJSONResponse)
+async def get_trending(request: Request, media_type: Literal["all", "movie", "tv"] = "all", page: int = 1, options: dict = Depends(title_view)):
+    entry = await tmdb_service.get_trending(media_type, page=page, **options)
+    return passthrough(entry, request)
+
+@api_router.get("/titles/search", response_class=RawJSONResponse)
+async def search_titles(request: Request, query: str, page: int = 1, options: dict = Depends(title_view)):
+    entry = await tmdb_service.search(query, page, **options)
+    return passthrough(entry, request)
+
+@api_router.get("/titles/{media_type}/{title_id}", response_class=RawJSONResponse)
+async def get_title_details(request: Request, media_type: str, title_id: int, options: dict = Depends(title_view)):
+    entry = await tmdb_service.get_details(media_type, title_id, **options)
+    return passthrough(entry, request)
+
+async def expand_details(items: List[dict]) -> List[dict]:
+    cards = await tmdb_service.get_cards([(item["media_type"], item["tmdb_id"]) for item in items])
+    for item in items:
+        item["details"] = cards.get((item["media_type"], item["tmdb_id"]))
+    return items
 
-@api_router.get("/titles/trending")
-async def get_trending(media_type: str = "all"):
-    data = await tmdb_service.get_trending(media_type)
-    return data
+HOME_ROW_LIMIT = int(os.environ.get("HOME_ROW_LIMIT", "20"))
+# Assembled home feeds, keyed by the ETags of the lists they were built from
+home_feeds = LRUCache(max_entries=int(os.environ.get("HOME_CACHE_ENTRIES", "8")))
+
+@api_router.get("/home", response_class=RawJSONResponse)
+async def get_home(request: Request):
+    rows = {
+        "trending": (tmdb_service.get_trending(raw=True), None),
+        "popular_movies": (tmdb_service.get_popular_movies(raw=True), "movie"),
+        "popular_tv": (tmdb_service.get_popular_tv(raw=True), "tv"),
+    }
+    results = await asyncio.gather(*(coro for coro, _ in rows.values()), return_exceptions=True)
+
+    failed = []
+    for name, result in zip(rows, results):
+        if isinstance(result, Exception):
+            logger.error("Home row %s failed: %r", name, result)
+        if isinstance(result, Exception) or result is None:
+            failed.append(name)
+    key = None if failed else ",".join(entry.etag for entry in results)
+    # the feed is only rebuilt (and recompressed) when one of its lists changes
+    entry = home_feeds.get(key, allow_stale=True) if key is not None else None
+    if entry is not None:
+        return passthrough(entry, request)
+
+    home = {"failed": failed}
+    for (name, (_, media_type)), result in zip(rows.items(), results):
+        home[name] = [] if name in failed else to_cards(result.data, media_type, HOME_ROW_LIMIT)
+    sources = [result for result in results if isinstance(result, CacheEntry)]
+    if key is None:
+        # a partial feed is served uncached so the next request retries the failed rows
+        entry = CacheEntry(home, dumps(home), time.time())
+    else:
+        entry = CacheEntry(home, dumps(home), min(source.expires_at for source in sources),
+                           min(source.stale_until for source in sources))
+        home_feeds.set(key, entry)
+    return passthrough(entry, request)
 
-@api_router.get("/titles/search")
-async def search_titles(query: str, page: int = 1):
-    data = await tmdb_service.search(query, page)
-    return data
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-@api_router.get("/titles/{media_type}/{title_id}")
-async def get_title_details(media_type: str, title_id: int):
-    if media_type == "movie":
-        data = await tmdb_service.get_movie_details(title_id)
-    else:
-        data = await tmdb_service.get_tv_details(title_id)
-    return data
+@api_router.get("/images/{size}/{path}")
+async def get_image(request: Request, size: str, path: str, format: Optional[Literal["webp", "jpeg"]] = None):
+    if not is_valid_image(size, path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        image = await image_cache.get(size, path, format)
+    except ImageNotFound:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except ImageUnavailable:
+        raise HTTPException(status_code=502, detail="Image temporarily unavailable")
+
+    headers = {"ETag": image.etag, "Cache-Control": IMAGE_CACHE_CONTROL, "Accept-Ranges": "bytes", "X-Content-Type-Options": "nosniff"}
+    if etag_matches(request.headers.get("if-none-match"), image.etag):
+        return Response(status_code=304, headers=headers)
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == image.etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), image.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{image.size}"})
+        if byte_range is not None:
+            return FileRangeResponse(image.path, *byte_range, image.size, image.content_type, headers)
+    # FileResponse hands the path to the server (pathsend) when it supports zero-copy sends
+    return FileResponse(image.path, media_type=image.content_type, headers=headers)
+
+@stats_router.get("/tmdb")
+async def get_tmdb_stats():
+    return tmdb_service.stats()
+
+@stats_router.get("/auth")
+async def get_auth_stats():
+    return {"principal_cache": principal_cache.stats(), "password_hasher": password_hasher_stats()}
+
+@stats_router.get("/images")
+async def get_image_stats():
+    return image_cache.stats()
+
+@stats_router.get("/watch-history")
+async def get_watch_history_stats():
+    return progress_buffer.stats()
+
+@stats_router.get("/slow-requests")
+async def get_slow_requests():
+    if slow_requests is None:
+        return {"enabled": False, "reports": []}
+    return {"enabled": True, "threshold": slow_requests.threshold, "reports": list(slow_requests.reports)}
+
+@stats_router.get("/recommendations")
+async def get_recommendation_stats():
+    return recommender.stats()
+
+@stats_router.get("/continue-watching")
+async def get_continue_watching_stats():
+    return continue_watching.stats()
+
+@api_router.get("/recommendations")
+async def get_recommendations(
+    profile_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+):
+    results = await recommender.recommend(profile_id, progress_buffer.pending_for(profile_id), limit)
+    return FastJSONResponse({"results": results})
+
+@api_router.get("/continue-watching", response_class=RawJSONResponse)
+async def get_continue_watching(
+    profile_id: str,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
+):
+    body, etag = await continue_watching.get(profile_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return RawJSONResponse(body, headers=headers)
 
 # Watchlist routes
-@api_router.post("/watchlist")
-async def add_to_watchlist(item: WatchlistAdd, profile_id: str, current_user: User = Depends(get_current_user)):
-    existing = await db.watchlist.find_one({"profile_id": profile_id, "tmdb_id": item.tmdb_id}, {"_id": 0})
-    if existing:
-        return {"message": "Already in watchlist"}
-    
+def watchlist_doc(profile_id: str, tmdb_id: int, media_type: str) -> dict:
     watchlist_item = WatchlistItem(
         profile_id=profile_id,
-        tmdb_id=item.tmdb_id,
-        media_type=item.media_type
+        tmdb_id=tmdb_id,
+        media_type=media_type
     )
-    doc = watchlist_item.model_dump()
+    doc = watchlist_item.model_dump(exclude={"profile_id", "tmdb_id"})
     doc['added_at'] = doc['added_at'].isoformat()
-    await db.watchlist.insert_one(doc)
+    return doc
+
+def latest_per_title(items) -> dict:
+    # ops on one title have no defined order within an unordered bulk write, so only the last one is applied
+    return {item.tmdb_id: index for index, item in enumerate(items)}
+
+@api_router.post("/watchlist")
+async def add_to_watchlist(item: WatchlistAdd, profile_id: str, current_user: Principal = Depends(get_current_user)):
+    doc = watchlist_doc(profile_id, item.tmdb_id, item.media_type)
+    try:
+        result = await db.watchlist.update_one(
+            {"profile_id": profile_id, "tmdb_id": item.tmdb_id},
+            {"$setOnInsert": doc},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # lost a race with a concurrent upsert for the same title
+        return {"message": "Already in watchlist"}
+    if result.upserted_id is None:
+        return {"message": "Already in watchlist"}
     return {"message": "Added to watchlist"}
 
+# Only the fields clients render; profile_id is already known to the caller
+WATCHLIST_PROJECTION = {"_id": 0, "id": 1, "tmdb_id": 1, "media_type": 1, "added_at": 1}
+WATCH_HISTORY_PROJECTION = {"_id": 0, "id": 1, "tmdb_id": 1, "media_type": 1, "position": 1, "duration": 1, "last_watched": 1}
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @api_router.get("/watchlist")
-async def get_watchlist(profile_id: str, current_user: User = Depends(get_current_user)):
-    items = await db.watchlist.find({"profile_id": profile_id}, {"_id": 0}).to_list(1000)
+async def get_watchlist(
+    profile_id: str,
+    response: Response,
+    expand: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    after = parse_cursor(cursor)
+    query = {"profile_id": profile_id, **keyset_filter("added_at", after)}
+    items = await db.watchlist.find(query, WATCHLIST_PROJECTION).sort(keyset_sort("added_at")).to_list(limit + 1)
+    items, next_cursor = paginate(items, "added_at", limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if expand == "details":
+        items = await expand_details(items)
     return items
 
 @api_router.delete("/watchlist/{tmdb_id}")
-async def remove_from_watchlist(tmdb_id: int, profile_id: str, current_user: User = Depends(get_current_user)):
+async def remove_from_watchlist(tmdb_id: int, profile_id: str, current_user: Principal = Depends(get_current_user)):
     await db.watchlist.delete_one({"profile_id": profile_id, "tmdb_id": tmdb_id})
     return {"message": "Removed from watchlist"}
 
+@api_router.post("/watchlist/batch")
+async def batch_watchlist(batch: WatchlistBatch, profile_id: str, current_user: Principal = Depends(get_current_user)):
+    latest = latest_per_title(batch.operations)
+    results = [{"tmdb_id": op.tmdb_id, "status": "superseded"} for op in batch.operations]
+    indexes, requests = [], []
+    for index, op in enumerate(batch.operations):
+        if latest[op.tmdb_id] != index:
+            continue
+        key = {"profile_id": profile_id, "tmdb_id": op.tmdb_id}
+        if op.op == "add":
+            requests.append(UpdateOne(key, {"$setOnInsert": watchlist_doc(profile_id, op.tmdb_id, op.media_type)}, upsert=True))
+        else:
+            requests.append(DeleteOne(key))
+        indexes.append(index)
+
+    try:
+        result = await db.watchlist.bulk_write(requests, ordered=False)
+        upserted, errors = set(result.upserted_ids), {}
+    except BulkWriteError as e:
+        upserted = {upsert["index"] for upsert in e.details.get("upserted", [])}
+        errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+    for position, index in enumerate(indexes):
+        op = batch.operations[index]
+        error = errors.get(position)
+        # a duplicate key on an add means a concurrent upsert inserted the title first
+        if error is not None and not (op.op == "add" and error.get("code") == DUPLICATE_KEY):
+            results[index].update(status="error", error=error.get("errmsg") or "Write failed")
+        elif op.op == "remove":
+            results[index]["status"] = "removed"
+        else:
+            results[index]["status"] = "added" if position in upserted else "exists"
+    return {"results": results}
+
 # Watch history routes
+def history_entry(profile_id: str, item: WatchHistoryUpdate) -> dict:
+    history_item = WatchHistoryItem(
+        profile_id=profile_id,
+        tmdb_id=item.tmdb_id,
+        media_type=item.media_type,
+        position=item.position,
+        duration=item.duration
+    )
+    entry = history_item.model_dump()
+    entry['last_watched'] = entry['last_watched'].isoformat()
+    return entry
+
 @api_router.post("/watch-history")
-async def update_watch_history(item: WatchHistoryUpdate, profile_id: str, current_user: User = Depends(get_current_user)):
-    existing = await db.watch_history.find_one({"profile_id": profile_id, "tmdb_id": item.tmdb_id}, {"_id": 0})
-    
-    if existing:
-        await db.watch_history.update_one(
-            {"profile_id": profile_id, "tmdb_id": item.tmdb_id},
-            {"$set": {
-                "position": item.position,
-                "duration": item.duration,
-                "last_watched": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-    else:
-        history_item = WatchHistoryItem(
-            profile_id=profile_id,
-            tmdb_id=item.tmdb_id,
-            media_type=item.media_type,
-            position=item.position,
-            duration=item.duration
-        )
-        doc = history_item.model_dump()
-        doc['last_watched'] = doc['last_watched'].isoformat()
-        await db.watch_history.insert_one(doc)
-    
+async def update_watch_history(item: WatchHistoryUpdate, profile_id: str, current_user: Principal = Depends(get_current_user)):
+    entry = history_entry(profile_id, item)
+    recommender.record(profile_id, entry)
+    continue_watching.record(profile_id, entry)
+    # collapsed per (profile, title) in memory and flushed in bulk; written through when the buffer is full
+    if progress_buffer.enabled and progress_buffer.add(entry):
+        return {"message": "Watch history updated"}
+
+    key, update = progress_update(entry)
+    try:
+        await db.watch_history.update_one(key, update, upsert=True)
+    except DuplicateKeyError:
+        # a concurrent upsert inserted the row first; apply the update to it
+        await db.watch_history.update_one(key, {"$set": update["$set"]})
+
     return {"message": "Watch history updated"}
 
+@api_router.post("/watch-history/batch")
+async def batch_watch_history(batch: WatchHistoryBatch, profile_id: str, current_user: Principal = Depends(get_current_user)):
+    latest = latest_per_title(batch.updates)
+    results = [{"tmdb_id": item.tmdb_id, "status": "superseded"} for item in batch.updates]
+    indexes, entries = [], []
+    for index, item in enumerate(batch.updates):
+        if latest[item.tmdb_id] != index:
+            continue
+        entry = history_entry(profile_id, item)
+        recommender.record(profile_id, entry)
+        continue_watching.record(profile_id, entry)
+        indexes.append(index)
+        entries.append(entry)
+
+    direct = list(range(len(entries)))
+    if progress_buffer.enabled:
+        # the buffer's next flush writes these together with everyone else's updates
+        direct = [position for position, entry in enumerate(entries) if not progress_buffer.add(entry)]
+    failed = {}
+    if direct:
+        errors = await progress_buffer.write([entries[position] for position in direct])
+        failed = {direct[index]: error for index, error in errors.items()}
+
+    for position, index in enumerate(indexes):
+        if position in failed:
+            results[index].update(status="error", error=failed[position])
+        else:
+            results[index]["status"] = "updated"
+    return {"results": results}
+
 @api_router.get("/watch-history")
-async def get_watch_history(profile_id: str, current_user: User = Depends(get_current_user)):
-    items = await db.watch_history.find({"profile_id": profile_id}, {"_id": 0}).sort("last_watched", -1).to_list(100)
+async def get_watch_history(
+    profile_id: str,
+    response: Response,
+    expand: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    after = parse_cursor(cursor)
+    pending = {entry["tmdb_id"]: entry for entry in progress_buffer.pending_for(profile_id)}
+    query = {"profile_id": profile_id, **keyset_filter("last_watched", after)}
+    # over-fetch by the number of buffered titles, whose stored rows are superseded below
+    items = await db.watch_history.find(query, WATCH_HISTORY_PROJECTION).sort(keyset_sort("last_watched")).to_list(limit + len(pending) + 1)
+    if pending:
+        # read through the write-behind buffer so the latest position is visible; a buffered
+        # title's stored row may lie outside this window, so its id is looked up separately
+        stored = await db.watch_history.find(
+            {"profile_id": profile_id, "tmdb_id": {"$in": list(pending)}},
+            {"_id": 0, "tmdb_id": 1, "id": 1, "media_type": 1},
+        ).to_list(len(pending))
+        stored = {row["tmdb_id"]: row for row in stored}
+        items = merge_pending(items, pending, stored, after, WATCH_HISTORY_PROJECTION)
+    items, next_cursor = paginate(items, "last_watched", limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if expand == "details":
+        items = await expand_details(items)
     return items
 
 app.include_router(api_router)
+app.include_router(stats_router)
+
+app.add_middleware(CompressionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -263,14 +634,74 @@ app.add_middleware(
     allow_origins=[o.strip().strip('"').strip("'") for o in os.environ.get('CORS_ORIGINS', '*').split(',') if o.strip()],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+if METRICS_ENABLED:
+    # outermost, so compression and CORS count towards the request time
+    app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+registry.register(Gauge("tmdb_in_flight_requests", "Upstream TMDb requests in flight", lambda: tmdb_service.pool_stats()["in_flight"]))
+registry.register(Gauge("tmdb_pool_connections_in_use", "TMDb client pool connections carrying a request", lambda: tmdb_service.pool_stats()["connections_in_use"]))
+registry.register(Gauge("watch_history_pending_updates", "Buffered watch-history updates", lambda: progress_buffer.stats()["pending"]))
+registry.register(Gauge("principal_cache_entries", "Cached authenticated principals", lambda: principal_cache.stats()["entries"]))
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_db_indexes():
+    # the unique users indexes back the register duplicate check, so they exist before serving;
+    # the rest run in the background so large existing collections don't delay startup
+    await ensure_indexes(db, BLOCKING_COLLECTIONS)
+    app.state.index_task = asyncio.create_task(
+        ensure_indexes(db, [name for name in INDEXES if name not in BLOCKING_COLLECTIONS])
+    )
+
+@app.on_event("startup")
+async def startup_tmdb_client():
+    await tmdb_service.start()
+    if tmdb_service.cache is not None and os.environ.get("TMDB_SHARED_CACHE", "false").lower() in ("1", "true", "yes"):
+        await tmdb_service.cache.attach_shared(db.tmdb_cache)
+    if tmdb_service.search_index is not None:
+        # load the persisted index before the warmer starts feeding it
+        await tmdb_service.search_index.start()
+    if CATALOG_SNAPSHOT_PATH:
+        tmdb_service.load_snapshot(CATALOG_SNAPSHOT_PATH)
+    tmdb_service.start_warmer()
+
+@app.on_event("startup")
+async def startup_image_cache():
+    await image_cache.start()
+
+@app.on_event("startup")
+async def startup_progress_buffer():
+    progress_buffer.start()
+
+@app.on_event("startup")
+async def startup_metrics():
+    if METRICS_ENABLED:
+        app.state.loop_monitor = asyncio.create_task(monitor_event_loop())
+    if slow_requests is not None:
+        slow_requests.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if getattr(app.state, "loop_monitor", None) is not None:
+        app.state.loop_monitor.cancel()
+    if slow_requests is not None:
+        slow_requests.stop()
+    await progress_buffer.close()
+    await tmdb_service.close()
+    await image_cache.close()
+    if tmdb_service.search_index is not None:
+        await tmdb_service.search_index.close()
+    shutdown_password_hasher()
     client.close()
@@ -1,53 +1,554 @@
+import asyncio
 import httpx
+import json
+import logging
 import os
-from typing import Dict, List, Optional
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cache_service import CacheEntry, ResponseCache, SingleFlight
+from catalog_snapshot import CatalogSnapshot, SnapshotEntry, SnapshotError
+from metrics import endpoint_label, tmdb_cache, tmdb_requests
+from resilience import CircuitBreaker, TokenBucket, backoff_delay, parse_retry_after
+from responses import dumps
+from search_index import SEARCH_INDEX_ENABLED, SEARCH_INDEX_MAX_AGE, SearchIndex
 
 TMDB_API_KEY = os.environ.get("TMDB_API_KEY", "YOUR_TMDB_API_KEY_PLACEHOLDER")
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
 TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p"
 
+# Connection pool tuning for the shared upstream client; requests queue on TMDB_MAX_CONCURRENCY
+# before they reach the pool, so keep max connections >= that cap or the pool becomes the bottleneck
+TMDB_MAX_CONNECTIONS = int(os.environ.get("TMDB_MAX_CONNECTIONS", "100"))
+TMDB_MAX_KEEPALIVE = int(os.environ.get("TMDB_MAX_KEEPALIVE", "20"))
+TMDB_KEEPALIVE_EXPIRY = float(os.environ.get("TMDB_KEEPALIVE_EXPIRY", "30"))
+TMDB_HTTP2 = os.environ.get("TMDB_HTTP2", "true").lower() in ("1", "true", "yes")
+TMDB_CONNECT_TIMEOUT = float(os.environ.get("TMDB_CONNECT_TIMEOUT", "5"))
+TMDB_TIMEOUT = float(os.environ.get("TMDB_TIMEOUT", "10"))
+
+TMDB_CACHE_ENABLED = os.environ.get("TMDB_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Response cache lifetimes (seconds) per endpoint family
+TMDB_CACHE_TTL_LISTS = int(os.environ.get("TMDB_CACHE_TTL_LISTS", "3600"))
+TMDB_CACHE_TTL_SEARCH = int(os.environ.get("TMDB_CACHE_TTL_SEARCH", "600"))
+TMDB_CACHE_TTL_DETAILS = int(os.environ.get("TMDB_CACHE_TTL_DETAILS", "86400"))
+# How long an expired list may still be served while it is refreshed in the background
+TMDB_STALE_TTL = int(os.environ.get("TMDB_STALE_TTL", "86400"))
+# How long expired details/search results are kept as a fallback when TMDb is failing
+TMDB_STALE_IF_ERROR_TTL = int(os.environ.get("TMDB_STALE_IF_ERROR_TTL", "86400"))
+
+# Upstream protection: client-side rate limit, concurrency cap, retries and circuit breaker
+TMDB_RATE_LIMIT = float(os.environ.get("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_BURST = int(os.environ.get("TMDB_RATE_BURST", "40"))
+TMDB_MAX_CONCURRENCY = int(os.environ.get("TMDB_MAX_CONCURRENCY", "50"))
+TMDB_RETRIES = int(os.environ.get("TMDB_RETRIES", "2"))
+# Total seconds one upstream call may take across all attempts and backoff sleeps
+TMDB_REQUEST_BUDGET = float(os.environ.get("TMDB_REQUEST_BUDGET", str(TMDB_TIMEOUT)))
+TMDB_BACKOFF_BASE = float(os.environ.get("TMDB_BACKOFF_BASE", "0.2"))
+TMDB_BACKOFF_MAX = float(os.environ.get("TMDB_BACKOFF_MAX", "2"))
+TMDB_RETRY_AFTER_MAX = float(os.environ.get("TMDB_RETRY_AFTER_MAX", "5"))
+TMDB_BREAKER_THRESHOLD = int(os.environ.get("TMDB_BREAKER_THRESHOLD", "5"))
+TMDB_BREAKER_RESET = float(os.environ.get("TMDB_BREAKER_RESET", "30"))
+
+# Background warmer for the first pages of popular/trending lists
+TMDB_WARM_PAGES = int(os.environ.get("TMDB_WARM_PAGES", "3"))
+TMDB_WARM_INTERVAL = float(os.environ.get("TMDB_WARM_INTERVAL", "60"))
+TMDB_WARM_MARGIN = float(os.environ.get("TMDB_WARM_MARGIN", "300"))
+
+# Upper bound on concurrent upstream lookups when hydrating lists of titles
+TMDB_DETAILS_CONCURRENCY = int(os.environ.get("TMDB_DETAILS_CONCURRENCY", "8"))
+
+# Sub-resources fetched with every title's details; keywords feed recommendations
+DETAILS_APPEND = "videos,credits,keywords"
+
+WARM_ENDPOINTS = ["movie/popular", "tv/popular", "trending/all/week"]
+
+# Fields the title cards and hero banner actually render
+CARD_FIELDS = (
+    "id", "media_type", "title", "name", "overview", "poster_path", "backdrop_path",
+    "release_date", "first_air_date", "vote_average",
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
 class TMDbService:
     def __init__(self):
         self.api_key = TMDB_API_KEY
         self.base_url = TMDB_BASE_URL
-    
-    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
-        if params is None:
-            params = {}
+        self.max_connections = TMDB_MAX_CONNECTIONS
+        self.http2 = TMDB_HTTP2 and HTTP2_AVAILABLE
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight = 0
+        self._pool_stats = {"requests": 0, "errors": 0, "peak_in_flight": 0, "concurrency_saturated": 0}
+        self._concurrency = asyncio.Semaphore(TMDB_MAX_CONCURRENCY)
+        self.rate_limiter = TokenBucket(TMDB_RATE_LIMIT, TMDB_RATE_BURST)
+        self.breaker = CircuitBreaker(TMDB_BREAKER_THRESHOLD, TMDB_BREAKER_RESET)
+        self._resilience_stats = {"retries": 0, "rate_limited": 0, "stale_on_error": 0, "budget_exhausted": 0}
+        self.cache: Optional[ResponseCache] = ResponseCache() if TMDB_CACHE_ENABLED else None
+        self.single_flight = SingleFlight()
+        self._warmer: Optional[asyncio.Task] = None
+        self._background = set()
+        self._refresh_stats = {"revalidations": 0, "warmed": 0, "refresh_errors": 0}
+        self.snapshot: Optional[CatalogSnapshot] = None
+        # called with (endpoint, data) for every payload that enters the catalog
+        self._listeners: List[Callable[[str, Dict], None]] = []
+        self.search_index: Optional[SearchIndex] = SearchIndex() if SEARCH_INDEX_ENABLED else None
+        if self.search_index is not None:
+            self.add_listener(self.search_index.add_payload)
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=TMDB_MAX_KEEPALIVE,
+                    keepalive_expiry=TMDB_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(TMDB_TIMEOUT, connect=TMDB_CONNECT_TIMEOUT),
+            )
+
+    def start_warmer(self, pages: int = TMDB_WARM_PAGES, interval: float = TMDB_WARM_INTERVAL):
+        if self._warmer is None and self.cache is not None and pages > 0:
+            self._warmer = asyncio.create_task(self._warm_loop(pages, interval))
+
+    def add_listener(self, listener: Callable[[str, Dict], None]):
+        self._listeners.append(listener)
+
+    def _notify(self, endpoint: str, data):
+        if not isinstance(data, dict):
+            return
+        for listener in self._listeners:
+            try:
+                listener(endpoint, data)
+            except Exception:
+                logger.exception("Catalog listener failed for %s", endpoint)
+
+    def load_snapshot(self, path: str) -> bool:
+        try:
+            snapshot = CatalogSnapshot(path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, SnapshotError) as e:
+            logger.warning("Ignoring catalog snapshot %s: %s", path, e)
+            return False
+        self._drop_snapshot()
+        self.snapshot = snapshot
+        if self._listeners:
+            for key in snapshot.keys():
+                self._notify(key.split("?", 1)[0], json.loads(snapshot.get(key)))
+        logger.info("Loaded catalog snapshot %s (%d entries, %ds old)", path, len(snapshot), snapshot.age)
+        return True
+
+    async def close(self):
+        if self._warmer is not None:
+            self._warmer.cancel()
+            self._warmer = None
+        for task in list(self._background):
+            task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._drop_snapshot()
+
+    def _drop_snapshot(self):
+        if self.snapshot is None:
+            return
+        if self.cache is not None:
+            # cached snapshot entries read from the mapping, which is about to close
+            self.cache.local.delete_where(lambda entry: isinstance(entry, SnapshotEntry))
+        self.snapshot.close()
+        self.snapshot = None
+
+    def pool_stats(self) -> Dict:
+        return {
+            **self._pool_stats,
+            "in_flight": self._in_flight,
+            "max_concurrency": TMDB_MAX_CONCURRENCY,
+            **self._connection_stats(),
+            "max_connections": self.max_connections,
+            "http2": self.http2,
+        }
+
+    def _connection_stats(self) -> Dict:
+        # the httpcore pool behind the client; with HTTP/2 one connection carries many requests
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        if pool is None:
+            return {"connections": 0, "connections_in_use": 0}
+        connections = pool.connections
+        return {
+            "connections": len(connections),
+            "connections_in_use": sum(1 for connection in connections if not connection.is_idle()),
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "pool": self.pool_stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "single_flight": self.single_flight.stats(),
+            "refresh": {**self._refresh_stats, "pending": len(self._background), "warmer": self._warmer is not None},
+            "resilience": {
+                **self._resilience_stats,
+                "breaker": self.breaker.stats(),
+                "rate_limiter": self.rate_limiter.stats(),
+            },
+            "search_index": self.search_index.stats() if self.search_index is not None else None,
+            "snapshot": self.snapshot.stats() if self.snapshot is not None else None,
+        }
+
+    @staticmethod
+    def cache_ttl(endpoint: str) -> int:
+        if endpoint.startswith("search/"):
+            return TMDB_CACHE_TTL_SEARCH
+        if TMDbService.is_list(endpoint):
+            return TMDB_CACHE_TTL_LISTS
+        return TMDB_CACHE_TTL_DETAILS
+
+    @staticmethod
+    def is_list(endpoint: str) -> bool:
+        return endpoint.startswith("trending/") or endpoint.endswith("/popular")
+
+    @staticmethod
+    def cache_key(endpoint: str, params: Optional[Dict] = None) -> str:
+        if not params:
+            return endpoint
+        query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        return f"{endpoint}?{query}"
+
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None, timeout: Optional[float] = None,
+                            raw: bool = False, view: str = "full", fields: Optional[Tuple[str, ...]] = None):
+        # raw=True returns the CacheEntry so routes can pass the upstream bytes through untouched
+        if view == "full" and not fields:
+            entry = await self._get_entry(endpoint, params, timeout)
+        else:
+            entry = await self._get_projection(endpoint, params, timeout, view, fields)
+        if raw:
+            return entry
+        return entry.data if entry is not None else None
+
+    async def _get_projection(self, endpoint: str, params: Optional[Dict], timeout: Optional[float],
+                              view: str, fields: Optional[Tuple[str, ...]]) -> Optional[CacheEntry]:
+        # Trimmed forms are cached under their own key and share the full payload's lifetime
+        key = f"{self.cache_key(endpoint, params)}#view={view}&fields={','.join(fields or ())}"
+        if self.cache is not None:
+            entry = await self.cache.get(key)
+            if entry is not None:
+                tmdb_cache.inc(endpoint_label(endpoint), "hit")
+                return entry
+
+        full = await self._get_entry(endpoint, params, timeout)
+        if full is None:
+            return None
+        data = project(full.data, view, fields)
+        entry = CacheEntry(data, dumps(data), full.expires_at, full.stale_until)
+        if self.cache is not None and full.is_fresh():
+            await self.cache.put(key, entry)
+        return entry
+
+    async def _get_entry(self, endpoint: str, params: Optional[Dict], timeout: Optional[float]) -> Optional[CacheEntry]:
+        key = self.cache_key(endpoint, params)
+        stale = None
+        label = endpoint_label(endpoint)
+        if self.cache is not None:
+            entry = await self.cache.get(key, allow_stale=True)
+            if entry is not None:
+                if entry.is_fresh():
+                    tmdb_cache.inc(label, "hit")
+                    return entry
+                if self.is_list(endpoint):
+                    tmdb_cache.inc(label, "stale")
+                    self._revalidate(key, endpoint, params)
+                    return entry
+                stale = entry
+        if stale is None and self.snapshot is not None:
+            entry = await self._from_snapshot(key, endpoint, params)
+            if entry is not None:
+                tmdb_cache.inc(label, "snapshot")
+                return entry
+        tmdb_cache.inc(label, "miss")
+
+        fresh = await self.single_flight.do(key, lambda: self._load(key, endpoint, params, timeout))
+        if fresh is None and stale is not None:
+            # upstream failed or the breaker is open: an expired copy beats an empty row
+            self._resilience_stats["stale_on_error"] += 1
+            return stale
+        return fresh
+
+    async def _from_snapshot(self, key: str, endpoint: str, params: Optional[Dict]) -> Optional[CacheEntry]:
+        if key not in self.snapshot:
+            return None
+        self.snapshot.hits += 1
+        # snapshot bodies age from when the snapshot was built, like any cached response
+        expires_at = self.snapshot.created_at + self.cache_ttl(endpoint)
+        stale_ttl = TMDB_STALE_TTL if self.is_list(endpoint) else TMDB_STALE_IF_ERROR_TTL
+        entry = SnapshotEntry(self.snapshot, key, expires_at, expires_at + stale_ttl)
+        if entry.is_fresh():
+            # only the local cache, which keeps the compressed variants; every worker maps the snapshot itself
+            if self.cache is not None:
+                self.cache.local.set(key, entry)
+        else:
+            # an outdated snapshot still beats a cold upstream call: serve it and refresh behind it
+            self._revalidate(key, endpoint, params)
+        return entry
+
+    def _revalidate(self, key: str, endpoint: str, params: Optional[Dict]):
+        if key in self.single_flight:
+            return
+        self._refresh_stats["revalidations"] += 1
+        task = asyncio.create_task(self._refresh(key, endpoint, params))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(self, key: str, endpoint: str, params: Optional[Dict]) -> bool:
+        try:
+            entry = await self.single_flight.do(key, lambda: self._load(key, endpoint, params, None))
+        except Exception:
+            logger.exception("Background refresh of %s failed", key)
+            entry = None
+        if entry is None:
+            self._refresh_stats["refresh_errors"] += 1
+            return False
+        return True
+
+    async def _warm_loop(self, pages: int, interval: float):
+        while True:
+            for endpoint in WARM_ENDPOINTS:
+                for page in range(1, pages + 1):
+                    params = {"page": page}
+                    key = self.cache_key(endpoint, params)
+                    entry = self.cache.local.get(key, allow_stale=True)
+                    if entry is not None and entry.ttl > TMDB_WARM_MARGIN:
+                        continue
+                    if await self._refresh(key, endpoint, params):
+                        self._refresh_stats["warmed"] += 1
+            await asyncio.sleep(interval)
+
+    async def _load(self, key: str, endpoint: str, params: Optional[Dict], timeout: Optional[float]) -> Optional[CacheEntry]:
+        response = await self._fetch(endpoint, params, timeout)
+        if response is None:
+            return None
+        data = response.json()
+        self._notify(endpoint, data)
+        ttl = self.cache_ttl(endpoint)
+        if self.cache is None:
+            return CacheEntry(data, response.content, time.time() + ttl)
+        stale_ttl = TMDB_STALE_TTL if self.is_list(endpoint) else TMDB_STALE_IF_ERROR_TTL
+        return await self.cache.set(key, data, response.content, ttl, stale_ttl)
+
+    async def _fetch(self, endpoint: str, params: Optional[Dict] = None, timeout: Optional[float] = None) -> Optional[httpx.Response]:
+        params = dict(params or {})
         params["api_key"] = self.api_key
-        
-        url = f"{self.base_url}/{endpoint}"
-        async with httpx.AsyncClient() as client:
+
+        if self._client is None:
+            await self.start()
+
+        if not self.breaker.allow():
+            # TMDb is unhealthy: fail fast and let callers fall back to cached data
+            return None
+
+        delay = 0.0
+        deadline = time.monotonic() + TMDB_REQUEST_BUDGET
+        for attempt in range(TMDB_RETRIES + 1):
+            if attempt:
+                if time.monotonic() + delay >= deadline:
+                    self._resilience_stats["budget_exhausted"] += 1
+                    break
+                self._resilience_stats["retries"] += 1
+                await asyncio.sleep(delay)
+            await self.rate_limiter.acquire()
+            # a slow attempt only gets what is left of the budget, so retries can't stack timeouts
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._resilience_stats["budget_exhausted"] += 1
+                break
             try:
-                response = await client.get(url, params=params, timeout=10.0)
-                response.raise_for_status()
-                return response.json()
+                response = await self._send(endpoint, params, min(timeout or TMDB_TIMEOUT, remaining))
             except httpx.HTTPError as e:
-                print(f"TMDb API error: {e}")
+                self._pool_stats["errors"] += 1
+                logger.warning("TMDb API error for %s: %r", endpoint, e)
+                delay = backoff_delay(attempt, TMDB_BACKOFF_BASE, TMDB_BACKOFF_MAX)
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                self._pool_stats["errors"] += 1
+                logger.warning("TMDb API error: %s for %s", response.status_code, endpoint)
+                delay = backoff_delay(attempt, TMDB_BACKOFF_BASE, TMDB_BACKOFF_MAX)
+                if response.status_code == 429:
+                    self._resilience_stats["rate_limited"] += 1
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        self.rate_limiter.pause(retry_after)
+                        if retry_after > TMDB_RETRY_AFTER_MAX:
+                            break
+                        delay = max(delay, retry_after)
+                continue
+
+            self.breaker.record_success()
+            if response.is_error:
+                # e.g. 404 for an unknown title: upstream is healthy, nothing to retry
+                self._pool_stats["errors"] += 1
+                logger.warning("TMDb API error: %s for %s", response.status_code, endpoint)
                 return None
-    
-    async def get_popular_movies(self, page: int = 1) -> Optional[Dict]:
-        return await self._make_request("movie/popular", {"page": page})
-    
-    async def get_popular_tv(self, page: int = 1) -> Optional[Dict]:
-        return await self._make_request("tv/popular", {"page": page})
-    
-    async def get_trending(self, media_type: str = "all", time_window: str = "week") -> Optional[Dict]:
-        return await self._make_request(f"trending/{media_type}/{time_window}")
-    
-    async def search(self, query: str, page: int = 1) -> Optional[Dict]:
-        return await self._make_request("search/multi", {"query": query, "page": page})
-    
-    async def get_movie_details(self, movie_id: int) -> Optional[Dict]:
-        return await self._make_request(f"movie/{movie_id}", {"append_to_response": "videos,credits"})
-    
-    async def get_tv_details(self, tv_id: int) -> Optional[Dict]:
-        return await self._make_request(f"tv/{tv_id}", {"append_to_response": "videos,credits"})
-    
+            return response
+
+        self.breaker.record_failure()
+        return None
+
+    async def _send(self, endpoint: str, params: Dict, timeout: Optional[float]) -> httpx.Response:
+        if self._concurrency.locked():
+            # Request has to queue for one of the TMDB_MAX_CONCURRENCY upstream slots
+            self._pool_stats["concurrency_saturated"] += 1
+        async with self._concurrency:
+            self._in_flight += 1
+            self._pool_stats["requests"] += 1
+            self._pool_stats["peak_in_flight"] = max(self._pool_stats["peak_in_flight"], self._in_flight)
+            started = time.perf_counter()
+            status = "error"
+            try:
+                kwargs = {"params": params}
+                if timeout is not None:
+                    kwargs["timeout"] = httpx.Timeout(timeout, connect=min(timeout, TMDB_CONNECT_TIMEOUT))
+                response = await self._client.get(f"/{endpoint}", **kwargs)
+                status = str(response.status_code)
+                return response
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+                raise
+            finally:
+                self._in_flight -= 1
+                tmdb_requests.observe(time.perf_counter() - started, endpoint_label(endpoint), status)
+
+    async def get_popular_movies(self, page: int = 1, **options) -> Optional[Dict]:
+        return await self._make_request("movie/popular", {"page": page}, **options)
+
+    async def get_popular_tv(self, page: int = 1, **options) -> Optional[Dict]:
+        return await self._make_request("tv/popular", {"page": page}, **options)
+
+    async def get_trending(self, media_type: str = "all", time_window: str = "week", page: int = 1, **options) -> Optional[Dict]:
+        return await self._make_request(f"trending/{media_type}/{time_window}", {"page": page}, **options)
+
+    async def search(self, query: str, page: int = 1, **options) -> Optional[Dict]:
+        if page == 1 and self.search_index is not None:
+            # type-ahead is answered from titles we already know; misses and deeper pages go to TMDb
+            local = self.search_index.page(query)
+            if local is not None:
+                tmdb_cache.inc("search/multi", "local")
+                return self._local_result(local, **options)
+        return await self._make_request("search/multi", {"query": query, "page": page}, **options)
+
+    @staticmethod
+    def _local_result(data: Dict, timeout: Optional[float] = None, raw: bool = False, view: str = "full",
+                      fields: Optional[Tuple[str, ...]] = None):
+        if view != "full" or fields:
+            data = project(data, view, fields)
+        if not raw:
+            return data
+        return CacheEntry(data, dumps(data), time.time() + SEARCH_INDEX_MAX_AGE)
+
+    async def get_movie_details(self, movie_id: int, **options) -> Optional[Dict]:
+        return await self._make_request(f"movie/{movie_id}", {"append_to_response": DETAILS_APPEND}, **options)
+
+    async def get_tv_details(self, tv_id: int, **options) -> Optional[Dict]:
+        return await self._make_request(f"tv/{tv_id}", {"append_to_response": DETAILS_APPEND}, **options)
+
+    async def get_details(self, media_type: str, tmdb_id: int, **options) -> Optional[Dict]:
+        if media_type == "movie":
+            return await self.get_movie_details(tmdb_id, **options)
+        return await self.get_tv_details(tmdb_id, **options)
+
+    async def get_many_details(self, titles: List[Tuple[str, int]], concurrency: int = TMDB_DETAILS_CONCURRENCY) -> Dict[Tuple[str, int], Optional[Dict]]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(media_type: str, tmdb_id: int) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await self.get_details(media_type, tmdb_id)
+                except Exception:
+                    logger.exception("Failed to load details for %s/%s", media_type, tmdb_id)
+                    return None
+
+        unique = list(dict.fromkeys(titles))
+        details = await asyncio.gather(*(fetch(media_type, tmdb_id) for media_type, tmdb_id in unique))
+        return dict(zip(unique, details))
+
+    async def get_cards(self, titles: List[Tuple[str, int]], concurrency: int = TMDB_DETAILS_CONCURRENCY) -> Dict[Tuple[str, int], Optional[Dict]]:
+        details = await self.get_many_details(titles, concurrency)
+        return {key: to_card(data, key[0]) if data else None for key, data in details.items()}
+
     @staticmethod
     def get_image_url(path: str, size: str = "original") -> str:
         if not path:
             return ""
         return f"{TMDB_IMAGE_BASE_URL}/{size}{path}"
 
+# Card view of a title's details: what the details dialog renders
+DETAIL_CARD_FIELDS = CARD_FIELDS + (
+    "genres", "runtime", "episode_run_time", "number_of_seasons", "tagline", "status",
+)
+TMDB_CARD_CAST_LIMIT = int(os.environ.get("TMDB_CARD_CAST_LIMIT", "10"))
+LIST_PAGE_FIELDS = ("page", "total_pages", "total_results")
+# Title fields a client may select with fields=; each selection is cached as its own projection,
+# so arbitrary names are refused rather than allowed to churn the cache
+SELECTABLE_FIELDS = frozenset(DETAIL_CARD_FIELDS + (
+    "videos", "credits", "keywords", "genre_ids", "popularity", "vote_count", "adult", "video",
+    "original_title", "original_name", "original_language", "origin_country", "homepage", "imdb_id",
+    "budget", "revenue", "last_air_date", "number_of_episodes", "seasons", "networks", "created_by",
+    "production_companies", "production_countries", "spoken_languages", "belongs_to_collection",
+))
+
+def trim_details(data: Dict, cast_limit: int = TMDB_CARD_CAST_LIMIT) -> Dict:
+    trimmed = {field: data[field] for field in DETAIL_CARD_FIELDS if data.get(field) is not None}
+    videos = (data.get("videos") or {}).get("results") or []
+    trimmed["videos"] = {"results": [
+        {"key": v.get("key"), "name": v.get("name"), "site": v.get("site"), "type": v.get("type")}
+        for v in videos
+        if v.get("site") == "YouTube" and v.get("type") in ("Trailer", "Teaser")
+    ]}
+    cast = (data.get("credits") or {}).get("cast") or []
+    trimmed["credits"] = {"cast": [
+        {"id": c.get("id"), "name": c.get("name"), "character": c.get("character"), "profile_path": c.get("profile_path")}
+        for c in cast[:cast_limit]
+    ]}
+    return trimmed
+
+def select_fields(item: Dict, fields: Tuple[str, ...]) -> Dict:
+    return {field: item[field] for field in fields if field in item}
+
+def project(data: Dict, view: str = "full", fields: Optional[Tuple[str, ...]] = None) -> Dict:
+    if "results" in data:
+        page = select_fields(data, LIST_PAGE_FIELDS)
+        results = data.get("results") or []
+        if view == "card":
+            results = [to_card(item) for item in results]
+        if fields:
+            results = [select_fields(item, fields) for item in results]
+        page["results"] = results
+        return page
+    if view == "card":
+        data = trim_details(data)
+    if fields:
+        data = select_fields(data, fields)
+    return data
+
+def to_card(item: Dict, media_type: Optional[str] = None) -> Dict:
+    card = {field: item[field] for field in CARD_FIELDS if item.get(field) is not None}
+    if media_type and "media_type" not in card:
+        card["media_type"] = media_type
+    return card
+
+def to_cards(data: Optional[Dict], media_type: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+    results = (data or {}).get("results") or []
+    if limit is not None:
+        results = results[:limit]
+    return [to_card(item, media_type) for item in results]
+
 tmdb_service = TMDbService()
@@ -142,7 +142,8 @@ class NebulaStreamAPITester:
             ("Get Popular Movies", "titles/popular?media_type=movie"),
             ("Get Popular TV", "titles/popular?media_type=tv"),
             ("Get Trending", "titles/trending"),
-            ("Search Titles", "titles/search?query=avengers")
+            ("Search Titles", "titles/search?query=avengers"),
+            ("Get Home Feed", "home")
         ]
         
         tmdb_results = []
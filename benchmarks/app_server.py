@@ -0,0 +1,43 @@
+"""Boots backend/server.py for benchmarks: TMDb calls go to the fake TMDb
+server and, with --mongo memory, MongoDB is replaced by an in-process
+mongomock-motor stand-in so no database needs to be running."""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend against local stand-ins")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--tmdb-url", default="http://127.0.0.1:8765/3")
+    parser.add_argument("--mongo", default="memory", help="'memory' for mongomock-motor, or a mongodb:// URL")
+    parser.add_argument("--db-name", default="nebula_bench")
+    args = parser.parse_args()
+
+    # the benchmark must not pick up or write persisted state from a dev checkout
+    os.environ["MONGO_URL"] = args.mongo if args.mongo != "memory" else "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db_name
+    os.environ.setdefault("SEARCH_INDEX_PATH", "")
+    os.environ.setdefault("CATALOG_SNAPSHOT_PATH", "")
+    os.environ.setdefault("TMDB_HTTP2", "false")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    if args.mongo == "memory":
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+    import logging
+    import uvicorn
+    import server
+    from tmdb_service import tmdb_service
+
+    tmdb_service.base_url = args.tmdb_url
+    # per-request upstream logging would dominate the profile
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
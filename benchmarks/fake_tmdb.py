@@ -0,0 +1,147 @@
+"""Local stand-in for the TMDb v3 API used by the benchmark suite.
+
+Payloads are generated deterministically from the title id, so runs are
+comparable. Latency, jitter, error rate and payload size are configurable,
+and /__stats reports how many upstream calls the backend made per endpoint.
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+GENRES = [28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 53, 10752, 37]
+CATALOG_SIZE = 5000
+WORDS = (
+    "star night dark river city last lost empire shadow light storm ocean edge road house fire "
+    "dream world king queen secret war love home winter summer ghost iron blood silent wild"
+).split()
+
+class FakeTMDb:
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, error_rate: float = 0.0,
+                 results_per_page: int = 20, cast_size: int = 40, keywords: int = 15, seed: int = 1):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.results_per_page = results_per_page
+        self.cast_size = cast_size
+        self.keywords = keywords
+        self.random = random.Random(seed)
+        self.calls = Counter()
+
+    def title(self, media_type: str, tmdb_id: int) -> dict:
+        rng = random.Random(f"{media_type}:{tmdb_id}")
+        name_field = "title" if media_type == "movie" else "name"
+        date_field = "release_date" if media_type == "movie" else "first_air_date"
+        return {
+            "id": tmdb_id,
+            "media_type": media_type,
+            name_field: f"{media_type.title()} {tmdb_id} " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))),
+            "overview": " ".join(rng.choice(WORDS) for _ in range(40)),
+            "poster_path": f"/poster{tmdb_id}.jpg",
+            "backdrop_path": f"/backdrop{tmdb_id}.jpg",
+            date_field: f"{rng.randint(1970, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "vote_average": round(rng.uniform(3, 9), 1),
+            "popularity": round(rng.expovariate(1 / 50), 3),
+            "genre_ids": rng.sample(GENRES, rng.randint(1, 3)),
+        }
+
+    def details(self, media_type: str, tmdb_id: int) -> dict:
+        rng = random.Random(f"details:{media_type}:{tmdb_id}")
+        data = self.title(media_type, tmdb_id)
+        data["genres"] = [{"id": genre, "name": f"Genre {genre}"} for genre in data.pop("genre_ids")]
+        data["runtime"] = rng.randint(80, 180)
+        data["tagline"] = " ".join(rng.choice(WORDS) for _ in range(6))
+        data["status"] = "Released"
+        data["videos"] = {"results": [
+            {"key": f"v{tmdb_id}{i}", "name": "Trailer", "site": "YouTube", "type": rng.choice(["Trailer", "Teaser", "Clip"])}
+            for i in range(5)
+        ]}
+        data["credits"] = {
+            "cast": [
+                {"id": rng.randint(1, 100000), "name": f"Actor {i}", "character": f"Role {i}", "profile_path": f"/p{i}.jpg", "order": i}
+                for i in range(self.cast_size)
+            ],
+            "crew": [{"id": rng.randint(1, 100000), "name": f"Crew {i}", "job": "Director" if i == 0 else "Writer"} for i in range(self.cast_size // 2)],
+        }
+        keywords = [{"id": rng.randint(1, 2000), "name": rng.choice(WORDS)} for _ in range(self.keywords)]
+        data["keywords"] = {"keywords": keywords} if media_type == "movie" else {"results": keywords}
+        return data
+
+    def page(self, media_type: str, page: int, salt: str) -> dict:
+        rng = random.Random(f"{salt}:{page}")
+        results = []
+        for _ in range(self.results_per_page):
+            kind = media_type if media_type != "all" else rng.choice(["movie", "tv"])
+            results.append(self.title(kind, rng.randint(1, CATALOG_SIZE)))
+        return {"page": page, "results": results, "total_pages": 500, "total_results": 500 * self.results_per_page}
+
+    async def respond(self, family: str, build):
+        self.calls[family] += 1
+        delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.error_rate:
+            self.calls["errors"] += 1
+            return JSONResponse({"status_message": "Injected failure"}, status_code=503)
+        return JSONResponse(build())
+
+    def app(self) -> Starlette:
+        async def popular(request: Request):
+            media_type = request.path_params["media_type"]
+            page = int(request.query_params.get("page", 1))
+            return await self.respond("popular", lambda: self.page(media_type, page, f"popular:{media_type}"))
+
+        async def trending(request: Request):
+            media_type = request.path_params["media_type"]
+            page = int(request.query_params.get("page", 1))
+            return await self.respond("trending", lambda: self.page(media_type, page, f"trending:{media_type}"))
+
+        async def search(request: Request):
+            query = request.query_params.get("query", "")
+            page = int(request.query_params.get("page", 1))
+            return await self.respond("search", lambda: self.page("all", page, f"search:{query}"))
+
+        async def details(request: Request):
+            media_type = request.path_params["media_type"]
+            tmdb_id = request.path_params["tmdb_id"]
+            return await self.respond("details", lambda: self.details(media_type, tmdb_id))
+
+        async def stats(request: Request):
+            return JSONResponse(dict(self.calls))
+
+        async def reset(request: Request):
+            self.calls.clear()
+            return JSONResponse({"reset": True})
+
+        return Starlette(routes=[
+            Route("/__stats", stats),
+            Route("/__reset", reset, methods=["POST"]),
+            Route("/3/{media_type:str}/popular", popular),
+            Route("/3/trending/{media_type:str}/{time_window:str}", trending),
+            Route("/3/search/multi", search),
+            Route("/3/{media_type:str}/{tmdb_id:int}", details),
+        ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake TMDb API for benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--cast-size", type=int, default=40)
+    parser.add_argument("--keywords", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    fake = FakeTMDb(args.latency_ms, args.jitter_ms, args.error_rate, args.results_per_page,
+                    args.cast_size, args.keywords, args.seed)
+    uvicorn.run(fake.app(), host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
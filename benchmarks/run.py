@@ -0,0 +1,277 @@
+"""Load/benchmark suite for the backend.
+
+Boots the fake TMDb server and backend/server.py (see app_server.py) as
+subprocesses, drives request mixes against them and reports throughput,
+latency percentiles and upstream TMDb calls per scenario:
+
+    python benchmarks/run.py --requests 1000 --concurrency 50
+    python benchmarks/run.py --save-baseline          # record benchmarks/baseline.json
+    python benchmarks/run.py --fail-on-regression 15  # compare against it, exit 1 on regressions
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+PASSWORD = "BenchPass123!"
+CATALOG_SIZE = 5000
+SEARCH_WORDS = ["star", "night", "dark", "river", "city", "lost", "empire", "shadow", "storm", "ocean"]
+
+Request = Tuple[str, str, Dict]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    # nearest-rank, so small samples report latencies that were actually observed
+    index = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+class Session:
+    def __init__(self, email: str, token: str, profile_id: str):
+        self.email = email
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.profile_id = profile_id
+
+def browse(sessions: List[Session], rng: random.Random) -> Callable[[int], Request]:
+    # Browse.js: the home feed, then now and again a "view all" list page
+    def make(i: int) -> Request:
+        if i % 4:
+            return "GET", "/api/home", {}
+        media_type = rng.choice(["movie", "tv"])
+        return "GET", "/api/titles/popular", {"params": {"media_type": media_type, "page": rng.randint(1, 3), "view": "card"}}
+    return make
+
+def details(sessions: List[Session], rng: random.Random) -> Callable[[int], Request]:
+    # a few titles are opened far more often than the long tail
+    def make(i: int) -> Request:
+        tmdb_id = min(int(rng.paretovariate(1.2)), CATALOG_SIZE)
+        media_type = "movie" if tmdb_id % 3 else "tv"
+        return "GET", f"/api/titles/{media_type}/{tmdb_id}", {"params": {"view": "card"}}
+    return make
+
+def search(sessions: List[Session], rng: random.Random) -> Callable[[int], Request]:
+    # type-ahead: successive prefixes of the same word
+    def make(i: int) -> Request:
+        word = SEARCH_WORDS[(i // 4) % len(SEARCH_WORDS)]
+        return "GET", "/api/titles/search", {"params": {"query": word[:2 + i % 4]}}
+    return make
+
+def progress(sessions: List[Session], rng: random.Random) -> Callable[[int], Request]:
+    # players report their position every few seconds for the title being watched
+    def make(i: int) -> Request:
+        session = sessions[i % len(sessions)]
+        return "POST", "/api/watch-history", {
+            "params": {"profile_id": session.profile_id},
+            "headers": session.headers,
+            "json": {"tmdb_id": rng.randint(1, 50), "media_type": "movie", "position": i, "duration": 7200},
+        }
+    return make
+
+def login(sessions: List[Session], rng: random.Random) -> Callable[[int], Request]:
+    def make(i: int) -> Request:
+        session = sessions[i % len(sessions)]
+        return "POST", "/api/auth/login", {"json": {"email": session.email, "password": PASSWORD}}
+    return make
+
+SCENARIOS = {
+    "browse": browse,
+    "details": details,
+    "search": search,
+    "progress": progress,
+    "login": login,
+}
+
+def start(script: str, *args: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, str(BENCH_DIR / script), *args])
+
+async def wait_ready(client: httpx.AsyncClient, url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get(url)).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout}s")
+        await asyncio.sleep(0.2)
+
+async def create_sessions(client: httpx.AsyncClient, count: int) -> List[Session]:
+    async def create(i: int) -> Session:
+        email = f"bench{i}@example.com"
+        response = await client.post("/api/auth/register", json={"email": email, "password": PASSWORD})
+        if response.status_code == 400:
+            response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        profile = await client.post("/api/profiles", json={"name": f"bench{i}"}, headers={"Authorization": f"Bearer {token}"})
+        profile.raise_for_status()
+        return Session(email, token, profile.json()["id"])
+    return list(await asyncio.gather(*(create(i) for i in range(count))))
+
+async def run_scenario(client: httpx.AsyncClient, make: Callable[[int], Request], requests: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            method, url, kwargs = make(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not (status.isdigit() and int(status) < 400))
+    return {
+        "requests": requests,
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+async def benchmark(args) -> Dict:
+    tmdb_port, app_port = free_port(), free_port()
+    processes = [
+        start("fake_tmdb.py", "--port", str(tmdb_port), "--latency-ms", str(args.latency_ms),
+              "--jitter-ms", str(args.jitter_ms), "--error-rate", str(args.error_rate),
+              "--results-per-page", str(args.results_per_page), "--cast-size", str(args.cast_size),
+              "--seed", str(args.seed)),
+        start("app_server.py", "--port", str(app_port), "--tmdb-url", f"http://127.0.0.1:{tmdb_port}/3",
+              "--mongo", args.mongo),
+    ]
+    tmdb = httpx.AsyncClient(base_url=f"http://127.0.0.1:{tmdb_port}")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=60)
+    try:
+        await wait_ready(tmdb, "/__stats")
+        await wait_ready(client, "/metrics")
+        sessions = await create_sessions(client, args.users)
+
+        results = {}
+        for name in args.scenarios:
+            make = SCENARIOS[name](sessions, random.Random(args.seed))
+            await tmdb.post("/__reset")
+            result = await run_scenario(client, make, args.requests, args.concurrency)
+            upstream = (await tmdb.get("/__stats")).json()
+            result["upstream_calls"] = sum(count for family, count in upstream.items() if family != "errors")
+            result["upstream"] = upstream
+            results[name] = result
+            print_result(name, result)
+        return {
+            "config": {key: getattr(args, key) for key in CONFIG_KEYS},
+            "machine": {"python": platform.python_version(), "platform": platform.platform()},
+            "scenarios": results,
+        }
+    finally:
+        await client.aclose()
+        await tmdb.aclose()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+CONFIG_KEYS = ("requests", "concurrency", "users", "latency_ms", "jitter_ms", "error_rate",
+               "results_per_page", "cast_size", "mongo", "seed")
+
+def print_result(name: str, result: Dict):
+    print(
+        f"{name:<10} {result['rps']:>9.1f} rps  p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+        f"p99 {result['p99_ms']:>8.2f}ms  errors {result['errors']:>5}  upstream {result['upstream_calls']:>5}"
+    )
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    if baseline.get("config") != current["config"]:
+        print("warning: baseline was recorded with a different configuration")
+    print("\nvs baseline:")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes = []
+        # (metric, True when bigger is worse)
+        for metric, worse_when_higher in (("rps", False), ("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("upstream_calls", True)):
+            old, new = before.get(metric), result.get(metric)
+            if not old:
+                continue
+            delta = (new - old) / old * 100
+            changes.append(f"{metric} {delta:+.1f}%")
+            if (delta if worse_when_higher else -delta) > threshold:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({delta:+.1f}%)")
+        print(f"{name:<10} " + "  ".join(changes))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend against local TMDb/MongoDB stand-ins")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--cast-size", type=int, default=40)
+    parser.add_argument("--mongo", default="memory", help="'memory' for mongomock-motor, or a mongodb:// URL")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT",
+                        help="exit 1 when a metric is more than PCT%% worse than the baseline")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    report = asyncio.run(benchmark(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    baseline_path = Path(args.baseline)
+    regressions: List[str] = []
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"\nSaved baseline to {baseline_path}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+        regressions = compare(report, baseline, args.fail_on_regression or 0)
+
+    if args.fail_on_regression is not None and regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 import React from 'react';
 import { Play, Plus, Info } from 'lucide-react';
 
-const IMAGE_BASE = 'https://image.tmdb.org/t/p';
+const BACKEND = process.env.REACT_APP_BACKEND_URL ? process.env.REACT_APP_BACKEND_URL.replace(/\/+$/,'') : '';
+const IMAGE_BASE = `${BACKEND}/api/images`;
 
 const TitleCard = ({ title, onClick, onPlay }) => {
   const imageUrl = title.poster_path
-    ? `${IMAGE_BASE}/w500${title.poster_path}`
+    ? `${IMAGE_BASE}/w342${title.poster_path}`
     : title.backdrop_path
     ? `${IMAGE_BASE}/w500${title.backdrop_path}`
     : 'https://via.placeholder.com/500x750/0B0F14/00E5FF?text=No+Image';
@@ -12,7 +12,7 @@ import { toast } from 'sonner';
 
 const BACKEND = process.env.REACT_APP_BACKEND_URL ? process.env.REACT_APP_BACKEND_URL.replace(/\/+$/,'') : '';
 const API = `${BACKEND}/api`;
-const IMAGE_BASE = 'https://image.tmdb.org/t/p';
+const IMAGE_BASE = `${API}/images`;
 
 const Browse = () => {
   const navigate = useNavigate();
@@ -20,6 +20,7 @@ const Browse = () => {
   const [trending, setTrending] = useState([]);
   const [popularMovies, setPopularMovies] = useState([]);
   const [popularTV, setPopularTV] = useState([]);
+  const [continueWatching, setContinueWatching] = useState([]);
   const [searchResults, setSearchResults] = useState([]);
   const [selectedTitle, setSelectedTitle] = useState(null);
   const [titleDetails, setTitleDetails] = useState(null);
@@ -42,17 +43,15 @@ const Browse = () => {
   }, [selectedProfile]);
 
   const fetchData = async () => {
+    fetchContinueWatching();
     try {
-      const [trendingRes, moviesRes, tvRes] = await Promise.all([
-        axios.get(`${API}/titles/trending`),
-        axios.get(`${API}/titles/popular?media_type=movie`),
-        axios.get(`${API}/titles/popular?media_type=tv`)
-      ]);
+      // single aggregated request; rows that failed upstream come back empty
+      const { data } = await axios.get(`${API}/home`);
 
-      const trendingList = trendingRes.data?.results || [];
+      const trendingList = data?.trending || [];
       setTrending(trendingList);
-      setPopularMovies(moviesRes.data?.results || []);
-      setPopularTV(tvRes.data?.results || []);
+      setPopularMovies(data?.popular_movies || []);
+      setPopularTV(data?.popular_tv || []);
       // initialize hero to first trending item
       setHeroIndex(0);
       setHeroTitle(trendingList[0] || null);
@@ -62,6 +61,16 @@ const Browse = () => {
     }
   };
 
+  const fetchContinueWatching = async () => {
+    try {
+      const { data } = await axios.get(`${API}/continue-watching?profile_id=${selectedProfile.id}`);
+      setContinueWatching(data?.results || []);
+    } catch (error) {
+      // the rail is optional; the rest of the page still renders
+      console.error('Failed to fetch continue watching', error);
+    }
+  };
+
   // Rotate hero every 20 seconds through the trending list
   useEffect(() => {
     if (!trending || trending.length <= 1) return undefined;
@@ -92,7 +101,7 @@ const Browse = () => {
     setSelectedTitle(title);
     const mediaType = title.media_type || (title.title ? 'movie' : 'tv');
     try {
-      const response = await axios.get(`${API}/titles/${mediaType}/${title.id}`);
+      const response = await axios.get(`${API}/titles/${mediaType}/${title.id}?view=card`);
       setTitleDetails(response.data);
     } catch (error) {
       console.error('Failed to fetch title details', error);
@@ -137,7 +146,7 @@ const Browse = () => {
   const playTitle = async (title) => {
     const mediaType = title.media_type || (title.title ? 'movie' : 'tv');
     try {
-      const response = await axios.get(`${API}/titles/${mediaType}/${title.id}`);
+      const response = await axios.get(`${API}/titles/${mediaType}/${title.id}?view=card`);
       const details = response.data;
       setTitleDetails(details);
       // call handlePlay using fetched details
@@ -267,7 +276,7 @@ const Browse = () => {
   const renderHero = () => {
     if (!heroTitle) return null;
     const backdropUrl = heroTitle.backdrop_path
-      ? `${IMAGE_BASE}/original${heroTitle.backdrop_path}`
+      ? `${IMAGE_BASE}/w1280${heroTitle.backdrop_path}`
       : 'https://via.placeholder.com/1920x1080/0B0F14/00E5FF?text=NebulaStream';
 
     return (
@@ -308,29 +317,31 @@ const Browse = () => {
     );
   };
 
-  const renderSection = (title, items, testId) => {
+  const renderSection = (title, items, testId, viewAll = true) => {
     if (!items || items.length === 0) return null;
 
     return (
       <div className="mb-12" data-testid={testId}>
         <div className="flex items-center justify-between mb-6 px-4 sm:px-6 lg:px-8">
           <h2 className="text-2xl font-bold text-red-600">{title}</h2>
-          <div>
-            <button
-              onClick={() => {
-                const map = {
-                  'Trending Now': 'trending',
-                  'Popular Movies': 'movie',
-                  'Popular TV Shows': 'tv'
-                };
-                const cat = map[title] || 'trending';
-                navigate(`/list/${cat}`);
-              }}
-              className="text-red-400 hover:text-red-200 text-sm"
-            >
-              View All
-            </button>
-          </div>
+          {viewAll && (
+            <div>
+              <button
+                onClick={() => {
+                  const map = {
+                    'Trending Now': 'trending',
+                    'Popular Movies': 'movie',
+                    'Popular TV Shows': 'tv'
+                  };
+                  const cat = map[title] || 'trending';
+                  navigate(`/list/${cat}`);
+                }}
+                className="text-red-400 hover:text-red-200 text-sm"
+              >
+                View All
+              </button>
+            </div>
+          )}
         </div>
         <div className="overflow-x-auto scrollbar-hide px-4 sm:px-6 lg:px-8">
           <div className="flex space-x-4 pb-4">
@@ -356,6 +367,7 @@ const Browse = () => {
           {searchResults.length > 0 && renderSection('Search Results', searchResults, 'search-results')}
           {searchResults.length === 0 && (
             <>
+              {renderSection('Continue Watching', continueWatching, 'continue-watching-section', false)}
               {renderSection('Trending Now', trending, 'trending-section')}
               {renderSection('Popular Movies', popularMovies, 'popular-movies-section')}
               {renderSection('Popular TV Shows', popularTV, 'popular-tv-section')}
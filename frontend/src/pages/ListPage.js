@@ -11,7 +11,7 @@ import { toast } from 'sonner';
 const BACKEND = process.env.REACT_APP_BACKEND_URL ? process.env.REACT_APP_BACKEND_URL.replace(/\/+$/,'') : '';
 const API = `${BACKEND}/api`;
 
-const IMAGE_BASE = 'https://image.tmdb.org/t/p';
+const IMAGE_BASE = `${API}/images`;
 const titleForCategory = (cat) => {
   switch (cat) {
     case 'movie':
@@ -116,7 +116,7 @@ const ListPage = () => {
   const playTitle = async (title) => {
     const mediaType = title.media_type || (title.title ? 'movie' : 'tv');
     try {
-      const res = await axios.get(`${API}/titles/${mediaType}/${title.id}`);
+      const res = await axios.get(`${API}/titles/${mediaType}/${title.id}?view=card`);
       const details = res.data;
       setTitleDetails(details);
 
@@ -154,7 +154,7 @@ const ListPage = () => {
     setSelectedTitle(title);
     const mediaType = title.media_type || (title.title ? 'movie' : 'tv');
     try {
-      const response = await axios.get(`${API}/titles/${mediaType}/${title.id}`);
+      const response = await axios.get(`${API}/titles/${mediaType}/${title.id}?view=card`);
       setTitleDetails(response.data);
     } catch (err) {
       console.error('Failed to fetch title details', err);
@@ -0,0 +1,35 @@
+import time
+
+from cache_service import CacheEntry, LRUCache
+
+BODY = b'{"overview":"' + b"x" * 10000 + b'"}'
+
+def entry() -> CacheEntry:
+    return CacheEntry({}, BODY, time.time() + 60)
+
+def test_variants_count_towards_cache_size():
+    cache = LRUCache(max_entries=10, max_bytes=1_000_000)
+    cache.set("a", entry())
+    cached = cache.get("a")
+    variant = cached.encoded("gzip")
+    assert cached.size == len(BODY)
+    assert cache.size == len(BODY) + len(variant)
+    # a second request for the same encoding reuses the variant
+    cached.encoded("gzip")
+    assert cache.size == len(BODY) + len(variant)
+
+def test_variants_trigger_eviction():
+    cache = LRUCache(max_entries=10, max_bytes=2 * len(BODY) + 10)
+    cache.set("a", entry())
+    cache.set("b", entry())
+    cache.get("b").encoded("gzip")
+    assert list(cache._entries) == ["b"]
+    assert cache.size == cache.get("b").footprint
+
+def test_removed_entries_stop_reporting_growth():
+    cache = LRUCache(max_entries=10, max_bytes=1_000_000)
+    cache.set("a", entry())
+    removed = cache.get("a")
+    cache.delete("a")
+    removed.encoded("gzip")
+    assert cache.size == 0
@@ -0,0 +1,103 @@
+import struct
+import time
+
+import pytest
+
+from cache_service import LRUCache
+from catalog_snapshot import HEADER, MAGIC, VERSION, CatalogSnapshot, SnapshotEntry, SnapshotError, write_snapshot
+
+ENTRIES = {
+    "movie/popular?page=1": b'{"page":1,"results":[{"id":550,"title":"Fight Club"}]}',
+    "movie/550?append_to_response=videos,credits,keywords": b'{"id":550,"title":"Fight Club \xc3\xa9"}',
+    "tv/1399": b"{}",
+    "search/multi?query=café": b'{"results":[]}',
+}
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    write_snapshot(path, ENTRIES, created_at=1700000000.0)
+    return path
+
+def test_round_trip(snapshot_path):
+    snapshot = CatalogSnapshot(snapshot_path)
+    try:
+        assert len(snapshot) == len(ENTRIES)
+        assert list(snapshot.keys()) == list(ENTRIES)
+        for key, body in ENTRIES.items():
+            assert key in snapshot
+            assert snapshot.get(key) == body
+        assert snapshot.get("movie/1") is None
+        assert snapshot.created_at == 1700000000.0
+    finally:
+        snapshot.close()
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "empty.snap")
+    write_snapshot(path, {})
+    snapshot = CatalogSnapshot(path)
+    assert len(snapshot) == 0
+    snapshot.close()
+
+def test_rewrite_replaces_file(snapshot_path):
+    write_snapshot(snapshot_path, {"tv/1": b"{}"})
+    snapshot = CatalogSnapshot(snapshot_path)
+    assert list(snapshot.keys()) == ["tv/1"]
+    snapshot.close()
+
+def rewrite(path, transform):
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(transform(data))
+
+def test_wrong_magic(snapshot_path):
+    rewrite(snapshot_path, lambda data: b"NOPE" + data[4:])
+    with pytest.raises(SnapshotError, match="not a catalog snapshot"):
+        CatalogSnapshot(snapshot_path)
+
+def test_wrong_version(snapshot_path):
+    rewrite(snapshot_path, lambda data: data[:4] + struct.pack("<H", VERSION + 1) + data[6:])
+    with pytest.raises(SnapshotError, match="version"):
+        CatalogSnapshot(snapshot_path)
+
+@pytest.mark.parametrize("keep", [0, 3, HEADER.size - 1, HEADER.size + 10])
+def test_truncated_before_index(snapshot_path, keep):
+    rewrite(snapshot_path, lambda data: data[:keep])
+    with pytest.raises(SnapshotError):
+        CatalogSnapshot(snapshot_path)
+
+@pytest.mark.parametrize("cut", [1, 5, 20])
+def test_truncated_index(snapshot_path, cut):
+    rewrite(snapshot_path, lambda data: data[:-cut])
+    with pytest.raises(SnapshotError):
+        CatalogSnapshot(snapshot_path)
+
+def test_body_outside_file(tmp_path):
+    path = str(tmp_path / "bad.snap")
+    key = b"tv/1"
+    index_offset = HEADER.size
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 1, 0.0, index_offset))
+        f.write(struct.pack("<QIH", HEADER.size, 4096, len(key)) + key)
+    with pytest.raises(SnapshotError):
+        CatalogSnapshot(path)
+
+def test_snapshot_entry_reads_from_the_mapping(snapshot_path):
+    snapshot = CatalogSnapshot(snapshot_path)
+    try:
+        key = "movie/550?append_to_response=videos,credits,keywords"
+        entry = SnapshotEntry(snapshot, key, time.time() + 60)
+        assert entry.body == ENTRIES[key]
+        assert entry.size == len(ENTRIES[key])
+        assert entry.data == {"id": 550, "title": "Fight Club \u00e9"}
+        cache = LRUCache(max_entries=10, max_bytes=1_000_000)
+        cache.set(key, entry)
+        # only the worker's own compressed copy counts against its cache
+        assert cache.size == 0
+        variant = entry.encoded("gzip")
+        assert cache.size == len(variant)
+        cache.delete_where(lambda cached: isinstance(cached, SnapshotEntry))
+        assert len(cache) == 0 and cache.size == 0
+    finally:
+        snapshot.close()
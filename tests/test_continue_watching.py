@@ -0,0 +1,89 @@
+import asyncio
+
+import orjson
+
+import continue_watching
+from continue_watching import ContinueWatching
+
+def watched(tmdb_id, last_watched, position=50):
+    return {"tmdb_id": tmdb_id, "media_type": "movie", "position": position, "duration": 100, "last_watched": last_watched}
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        return FakeCursor([dict(doc) for doc in self.docs])
+
+class FakeBuffer:
+    def pending_for(self, profile_id):
+        return []
+
+def titles(body):
+    return [item["id"] for item in orjson.loads(body)["results"]]
+
+def test_write_during_render_is_not_lost(monkeypatch):
+    rails = ContinueWatching(FakeCollection([watched(1, "2024-01-01")]), FakeBuffer())
+
+    async def get_cards(missing):
+        # a progress write lands while the card details are loading
+        rails.record("p", watched(2, "2024-01-02"))
+        return {key: {"id": key[1]} for key in missing}
+
+    monkeypatch.setattr(continue_watching.tmdb_service, "get_cards", get_cards)
+
+    async def main():
+        body, _ = await rails.get("p")
+        assert titles(body) == [2, 1]
+        monkeypatch.undo()
+        assert (await rails.get("p"))[0] == body
+
+    asyncio.run(main())
+
+def test_finished_title_is_dropped_from_rendered_rail(monkeypatch):
+    rails = ContinueWatching(FakeCollection([watched(1, "2024-01-01"), watched(2, "2024-01-02")]), FakeBuffer())
+
+    async def get_cards(missing):
+        return {key: {"id": key[1]} for key in missing}
+
+    monkeypatch.setattr(continue_watching.tmdb_service, "get_cards", get_cards)
+
+    async def main():
+        first, etag = await rails.get("p")
+        assert titles(first) == [2, 1]
+        rails.record("p", watched(2, "2024-01-03", position=99))
+        body, changed = await rails.get("p")
+        assert titles(body) == [1]
+        assert changed != etag
+
+    asyncio.run(main())
+
+def test_failed_details_are_retried(monkeypatch):
+    rails = ContinueWatching(FakeCollection([watched(1, "2024-01-01")]), FakeBuffer())
+    upstream = {"up": False}
+
+    async def get_cards(missing):
+        return {key: {"id": key[1], "title": "Up"} if upstream["up"] else None for key in missing}
+
+    monkeypatch.setattr(continue_watching.tmdb_service, "get_cards", get_cards)
+
+    async def main():
+        body, _ = await rails.get("p")
+        assert "title" not in orjson.loads(body)["results"][0]
+        upstream["up"] = True
+        body, _ = await rails.get("p")
+        assert orjson.loads(body)["results"][0]["title"] == "Up"
+        assert rails.stats()["partial"] == 1
+
+    asyncio.run(main())
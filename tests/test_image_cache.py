@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from image_cache import ImageCache, ImageUnavailable, is_valid
+
+def cache(directory, requests, max_bytes=10_000) -> ImageCache:
+    def handler(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, content=b"x" * 100, headers={"content-type": "image/jpeg"})
+
+    images = ImageCache(str(directory), max_bytes=max_bytes)
+    images._client = httpx.AsyncClient(base_url="https://images.test/t/p", transport=httpx.MockTransport(handler))
+    images._scan()
+    return images
+
+def test_only_allowlisted_sizes_are_valid():
+    assert is_valid("w342", "abc.jpg")
+    assert is_valid("original", "abc.png")
+    assert is_valid("w240", "abc.jpg")
+    assert not is_valid("w341", "abc.jpg")
+    assert not is_valid("w9999", "abc.jpg")
+    assert not is_valid("w342", "../abc.jpg")
+
+def test_file_evicted_by_another_worker_is_refetched(tmp_path):
+    requests = []
+    first, second = cache(tmp_path, requests), cache(tmp_path, requests)
+
+    async def main():
+        image = await first.get("w500", "abc.jpg")
+        # the other worker's index also knows the file, and evicts it
+        second._scan()
+        os.remove(image.path)
+        again = await first.get("w500", "abc.jpg")
+        assert os.path.exists(again.path)
+        assert first.size == again.size
+        assert first.stats()["vanished"] == 1
+
+    asyncio.run(main())
+    assert requests == ["/t/p/w500/abc.jpg"] * 2
+
+def test_missing_source_during_resize_is_unavailable(tmp_path, monkeypatch):
+    requests = []
+    images = cache(tmp_path, requests)
+
+    def read_bytes(path):
+        # evicted every time between the lookup and the read
+        raise FileNotFoundError(str(path))
+
+    monkeypatch.setattr("image_cache.Path.read_bytes", read_bytes)
+
+    async def main():
+        with pytest.raises(ImageUnavailable):
+            await images.get("w240", "abc.jpg")
+
+    asyncio.run(main())
+    assert requests == ["/t/p/w300/abc.jpg"] * 2
+    assert images.stats()["vanished"] == 2
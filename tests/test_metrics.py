@@ -0,0 +1,11 @@
+from metrics import endpoint_label
+
+def test_endpoint_label_collapses_ids():
+    assert endpoint_label("movie/550") == "movie/{id}"
+    assert endpoint_label("tv/1399") == "tv/{id}"
+    assert endpoint_label("trending/movie/week") == "trending/movie/week"
+    assert endpoint_label("search/multi") == "search/multi"
+
+def test_endpoint_label_folds_unknown_shapes():
+    assert endpoint_label("trending/anything/week") == "other"
+    assert endpoint_label("movie/550/../../foo") == "other"
@@ -0,0 +1,88 @@
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, is_after, keyset_filter, paginate
+from progress_buffer import merge_pending
+
+FIELDS = ("id", "tmdb_id", "media_type", "position", "duration", "last_watched")
+
+def row(tmdb_id, last_watched, item_id=None, position=10):
+    return {
+        "id": item_id or f"id{tmdb_id}",
+        "tmdb_id": tmdb_id,
+        "media_type": "movie",
+        "position": position,
+        "duration": 100,
+        "last_watched": last_watched,
+    }
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-01-01T00:00:00", "abc")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2024-01-01T00:00:00", "abc")
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    encode_cursor("a", "b")[:-3],
+    "eyJ4IjoxfQ",  # {"x":1}
+    "WyJhIl0",  # ["a"]
+    "WzEsMl0",  # [1,2]
+    "",
+])
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+def test_keyset_filter():
+    assert keyset_filter("last_watched", None) == {}
+    assert keyset_filter("last_watched", ("t", "b")) == {
+        "$or": [{"last_watched": {"$lt": "t"}}, {"last_watched": "t", "id": {"$lt": "b"}}]
+    }
+
+def test_paginate_breaks_ties_on_id():
+    items = [row(1, "t", "a"), row(2, "t", "c"), row(3, "t", "b"), row(4, "s", "z")]
+    page, cursor = paginate(items, "last_watched", 2)
+    assert [item["id"] for item in page] == ["c", "b"]
+    after = decode_cursor(cursor)
+    assert after == ("t", "b")
+    rest = [item for item in items if is_after(item, "last_watched", after)]
+    page, cursor = paginate(rest, "last_watched", 2)
+    assert [item["id"] for item in page] == ["a", "z"]
+    assert cursor is None
+
+def test_paginate_without_more_items_has_no_cursor():
+    page, cursor = paginate([row(1, "t")], "last_watched", 1)
+    assert len(page) == 1 and cursor is None
+
+def test_merge_pending_on_first_page_keeps_stored_id():
+    items = [row(1, "2024-01-03"), row(2, "2024-01-02")]
+    pending = {2: row(2, "2024-02-01", "fresh", position=50), 9: row(9, "2024-02-02", "new9")}
+    stored = {2: {"id": "id2", "media_type": "movie"}}
+    merged = merge_pending(items, pending, stored, None, FIELDS)
+    page, _ = paginate(merged, "last_watched", 10)
+    assert [(item["tmdb_id"], item["id"]) for item in page] == [(9, "new9"), (2, "id2"), (1, "id1")]
+    assert page[1]["position"] == 50
+
+def test_merge_pending_outside_window_uses_stored_id():
+    # the stored row for title 5 is older than the fetched window
+    items = [row(1, "2024-01-03")]
+    pending = {5: row(5, "2024-02-01", "fresh")}
+    stored = {5: {"id": "id5", "media_type": "tv"}}
+    merged = merge_pending(items, pending, stored, None, FIELDS)
+    assert {item["tmdb_id"]: (item["id"], item["media_type"]) for item in merged}[5] == ("id5", "tv")
+
+def test_merge_pending_on_second_page():
+    after = ("2024-01-03", "id3")
+    items = [row(2, "2024-01-02"), row(1, "2024-01-01")]
+    # recently updated titles were already served on page 1
+    pending = {4: row(4, "2024-02-01", "id4"), 1: row(1, "2024-03-01", "fresh")}
+    stored = {1: {"id": "id1", "media_type": "movie"}, 4: {"id": "id4", "media_type": "movie"}}
+    merged = merge_pending(items, pending, stored, after, FIELDS)
+    assert [item["tmdb_id"] for item in merged] == [2]
+
+def test_merge_pending_on_second_page_with_older_buffered_entry():
+    after = ("2024-01-03", "id3")
+    items = [row(2, "2024-01-02")]
+    pending = {7: row(7, "2024-01-01", "id7")}
+    merged = merge_pending(items, pending, {}, after, FIELDS)
+    page, _ = paginate(merged, "last_watched", 10)
+    assert [item["tmdb_id"] for item in page] == [2, 7]
@@ -0,0 +1,78 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from progress_buffer import ProgressBuffer
+
+def update(tmdb_id, position=10):
+    return {"id": f"id-{tmdb_id}", "profile_id": "p", "tmdb_id": tmdb_id, "media_type": "movie",
+            "position": position, "duration": 100, "last_watched": "2024-01-01T00:00:00"}
+
+class FakeCollection:
+    def __init__(self):
+        self.writes = []
+        self.error = None
+        self.failing = set()
+
+    async def bulk_write(self, ops, ordered=True):
+        if self.error is not None:
+            raise self.error
+        errors = [{"index": index, "code": 121, "errmsg": "invalid"}
+                  for index, op in enumerate(ops) if op._filter["tmdb_id"] in self.failing]
+        self.writes.extend(op._filter["tmdb_id"] for index, op in enumerate(ops) if op._filter["tmdb_id"] not in self.failing)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+def test_full_buffer_refuses_new_titles():
+    buffer = ProgressBuffer(FakeCollection(), max_pending=100, max_buffered=2)
+    assert buffer.add(update(1)) and buffer.add(update(2))
+    assert not buffer.add(update(3))
+    # newer progress for an already buffered title still collapses into it
+    assert buffer.add(update(1, position=20))
+    assert buffer.stats()["pending"] == 2
+    assert buffer.stats()["overflow"] == 1
+
+def test_unavailable_mongo_requeues_then_drops():
+    collection = FakeCollection()
+    collection.error = AutoReconnect("down")
+    buffer = ProgressBuffer(collection, max_attempts=2)
+    buffer.add(update(1))
+
+    async def main():
+        await buffer.flush()
+        assert buffer.stats()["pending"] == 1
+        await buffer.flush()
+        assert buffer.stats()["pending"] == 0
+        assert buffer.stats()["dropped"] == 1
+
+    asyncio.run(main())
+
+def test_failed_entries_are_retried_like_failed_flushes():
+    collection = FakeCollection()
+    collection.failing = {2}
+    buffer = ProgressBuffer(collection, max_attempts=3)
+    buffer.add(update(1))
+    buffer.add(update(2))
+
+    async def main():
+        await buffer.flush()
+        assert buffer.pending_for("p") == [update(2)]
+        collection.failing = set()
+        await buffer.flush()
+        assert buffer.stats()["pending"] == 0
+        assert buffer._attempts == {}
+
+    asyncio.run(main())
+    assert collection.writes == [1, 2]
+
+def test_size_triggered_flush_is_awaited_on_close():
+    collection = FakeCollection()
+    buffer = ProgressBuffer(collection, max_pending=1)
+
+    async def main():
+        buffer.add(update(1))
+        assert buffer._flushing is not None
+        await buffer.close()
+
+    asyncio.run(main())
+    assert collection.writes == [1]
@@ -0,0 +1,101 @@
+import asyncio
+
+from recommendations import ProfileTaste, Recommender
+
+def title(tmdb_id, genres, popularity=1.0):
+    return {"id": tmdb_id, "title": f"T{tmdb_id}", "genre_ids": genres, "popularity": popularity}
+
+def recommender(**options) -> Recommender:
+    return Recommender(collection=None, dimensions=64, **options)
+
+def test_rows_are_reused_past_max_titles():
+    rec = recommender(max_titles=4)
+    for tmdb_id in range(10):
+        rec.add_title("movie", title(tmdb_id, [tmdb_id]))
+    assert len(rec._matrix) == 4
+    assert list(rec._rows) == [("movie", 6), ("movie", 7), ("movie", 8), ("movie", 9)]
+    assert sorted(rec._rows.values()) == [0, 1, 2, 3]
+    assert rec.stats()["titles_evicted"] == 6
+
+def test_seen_titles_are_kept_longest():
+    rec = recommender(max_titles=2)
+    rec.add_title("movie", title(1, [1]))
+    rec.add_title("movie", title(2, [2]))
+    rec.add_title("movie", title(1, [1]))
+    rec.add_title("movie", title(3, [3]))
+    assert set(rec._rows) == {("movie", 1), ("movie", 3)}
+
+def test_search_payloads_are_not_indexed():
+    rec = recommender()
+    rec.add_payload("search/multi", {"results": [dict(title(1, [28]), media_type="movie")]})
+    rec.add_payload("movie/popular", {"results": [title(2, [28])]})
+    assert list(rec._rows) == [("movie", 2)]
+
+def test_recommend_skips_evicted_watched_titles():
+    rec = recommender(max_titles=3)
+    for tmdb_id in range(3):
+        rec.add_title("movie", title(tmdb_id, [28, tmdb_id]))
+    rec._profiles["p"] = ProfileTaste(rec.dimensions)
+    rec.record("p", {"tmdb_id": 0, "media_type": "movie", "position": 90, "duration": 100})
+    # the watched title is pushed out by a newer one
+    rec.add_title("movie", title(3, [28]))
+    results = asyncio.run(rec.recommend("p"))
+    assert all(card["because"] is None for card in results)
+    assert {card["id"] for card in results} == {1, 2, 3}
+
+def test_list_sightings_refresh_titles_with_details():
+    rec = recommender(max_titles=2)
+    rec.add_title("movie", dict(title(1, [28]), keywords={"keywords": [{"id": 5}]}))
+    rec.add_title("movie", title(2, [18]))
+    # a list item for title 1 doesn't replace its richer features but still counts as a sighting
+    rec.add_title("movie", title(1, [28]))
+    rec.add_title("movie", title(3, [35]))
+    assert set(rec._rows) == {("movie", 1), ("movie", 3)}
+
+class SlowHistory:
+    def __init__(self, docs, during=None):
+        self.docs = docs
+        self.during = during
+        self.reads = 0
+
+    def find(self, query, projection):
+        return self
+
+    def sort(self, field, direction):
+        return self
+
+    async def to_list(self, length):
+        self.reads += 1
+        if self.during is not None:
+            self.during()
+        await asyncio.sleep(0)
+        return list(self.docs)
+
+def watched(tmdb_id, position=90):
+    return {"tmdb_id": tmdb_id, "media_type": "movie", "position": position, "duration": 100}
+
+def test_write_during_build_is_kept():
+    history = SlowHistory([watched(1)])
+    rec = Recommender(history, dimensions=64)
+    for tmdb_id in (1, 2, 3):
+        rec.add_title("movie", title(tmdb_id, [28]))
+    history.during = lambda: rec.record("p", watched(3))
+    results = asyncio.run(rec.recommend("p"))
+    assert set(rec._profiles["p"].weights) == {("movie", 1), ("movie", 3)}
+    assert [card["id"] for card in results] == [2]
+
+def test_tastes_are_rebuilt_after_ttl():
+    history = SlowHistory([watched(1)])
+    rec = Recommender(history, dimensions=64, ttl=0)
+    rec.add_title("movie", title(1, [28]))
+    rec.add_title("movie", title(2, [28]))
+
+    async def main():
+        await rec.recommend("p")
+        # written through another worker
+        history.docs.append(watched(2))
+        await rec.recommend("p")
+
+    asyncio.run(main())
+    assert history.reads == 2
+    assert set(rec._profiles["p"].weights) == {("movie", 1), ("movie", 2)}
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, TokenBucket, backoff_delay, parse_retry_after
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # replace the module's references only, so the event loop keeps the real clock
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(resilience, "asyncio", SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+def test_token_bucket_allows_burst_then_waits(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+
+    async def run():
+        for _ in range(3):
+            await bucket.acquire()
+
+    asyncio.run(run())
+    assert clock.sleeps == [pytest.approx(0.1)]
+    assert bucket.waits == 1
+
+def test_token_bucket_pause_holds_callers_for_retry_after(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.pause(3)
+    started = clock.now
+    asyncio.run(bucket.acquire())
+    assert clock.now - started == pytest.approx(3)
+    assert bucket.stats()["paused_for"] == 0
+
+def test_token_bucket_pause_never_shortens_an_existing_pause(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.pause(5)
+    bucket.pause(1)
+    assert bucket.stats()["paused_for"] == pytest.approx(5)
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["short_circuited"] == 1
+    assert breaker.trips == 1
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def tripped(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    return breaker
+
+def test_breaker_half_open_lets_a_single_probe_through(clock):
+    breaker = tripped(clock)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+def test_breaker_closes_when_probe_succeeds(clock):
+    breaker = tripped(clock)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+def test_breaker_reopens_when_probe_fails(clock):
+    breaker = tripped(clock)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+def test_breaker_stays_open_before_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    assert breaker.state == CircuitBreaker.OPEN
+
+@pytest.mark.parametrize("value, expected", [("5", 5.0), ("0.5", 0.5), ("-3", 0.0), ("", None), (None, None), ("soon", None)])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(120, abs=2)
+
+def test_parse_retry_after_past_http_date():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, 0.2, 2) <= min(2, 0.2 * 2 ** attempt)